@@ -0,0 +1,88 @@
+import argparse, glob, os, re, sys
+
+# Grades tc<N>.out against ans<N>.out in one process (replaces the bash
+# read loops in compareNew.sh). Answers are matched by position, exactly as
+# compareNew.sh did; the only difference is that lines are split on any run
+# of tabs or spaces, so the "\t\t" refintnorm-* writer and the space-padded
+# ans files compare equal.
+
+CASE_RE = re.compile(r"^ans(\d+)\.out(?:\.txt)?$")
+
+# ---------- parse one output file ----------
+def parse_output(path):
+    """ The graded values of one output file in order, one slot per value as
+    compareNew.sh counted them: the header line is skipped, "DB referential
+    integrity: X" and "DB normalized: X" give one slot each, every other line
+    gives two (its 2nd and 3rd token, "" if missing). """
+    values = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = [ln.split() for ln in f.read().splitlines()]
+    lines = [ln for ln in lines if ln]
+    for toks in lines[1:]:
+        toks = toks + ["", "", ""]
+        if toks[0] == "DB" and toks[1] == "referential":
+            values.append(toks[3])
+        elif toks[0] == "DB" and toks[1] == "normalized:":
+            values.append(toks[2])
+        else:
+            values += [toks[1], toks[2]]
+    return values
+
+# ---------- score ----------
+def score_case(expected, actual):
+    """ Same scale as compareNew.sh: 10 - floor(10 * wrong / answers), with
+    the i-th answer compared to the i-th value of the output. """
+    right = sum(1 for i, v in enumerate(expected) if i < len(actual) and actual[i] == v)
+    if not expected:
+        return right, 0, 0
+    wrong = len(expected) - right
+    return right, len(expected), 10 - (10 * wrong) // len(expected)
+
+def find_cases(directory):
+    """ [(N, answer path)], one per case; ans<N>.out wins over ans<N>.out.txt. """
+    cases = {}
+    for path in sorted(glob.glob(os.path.join(directory, "ans*.out*"))):
+        m = CASE_RE.match(os.path.basename(path))
+        if m and (int(m.group(1)) not in cases or path.endswith(".out")):
+            cases[int(m.group(1))] = path
+    return sorted(cases.items())
+
+def grade_dir(directory, grade_name="grade", report_name="grade_report.txt"):
+    results = []
+    for n, ans_path in find_cases(directory):
+        expected = parse_output(ans_path)
+        out_path = os.path.join(directory, f"tc{n}.out")
+        actual = parse_output(out_path) if os.path.exists(out_path) else []
+        right, total, score = score_case(expected, actual)
+        if not os.path.exists(out_path):
+            score = 0
+        results.append((n, right, total, score))
+    total_score = sum(r[3] for r in results)
+
+    with open(os.path.join(directory, report_name), "w", encoding="utf-8") as f:
+        f.write("case\tright\ttotal\tscore\n")
+        for n, right, total, score in results:
+            f.write(f"tc{n}\t{right}\t{total}\t{score}\n")
+        f.write(f"\nsum\t\t\t{total_score}\n")
+    with open(os.path.join(directory, grade_name), "w", encoding="utf-8") as f:
+        f.write(f"{total_score}\n")
+    return results, total_score
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="grade tc*.out against ans*.out")
+    ap.add_argument("dirs", nargs="*", default=["."], help="grading directories (default: .)")
+    ap.add_argument("--grade", default="grade", help="summary grade file name")
+    ap.add_argument("--report", default="grade_report.txt", help="per-case report file name")
+    args = ap.parse_args()
+
+    for d in args.dirs:
+        if not os.path.isdir(d):
+            print(f"Error: not a directory: {d}")
+            sys.exit(1)
+        results, total_score = grade_dir(d, args.grade, args.report)
+        for n, right, total, score in results:
+            print(f"{d}: tc{n} {right}/{total} -> {score}")
+        print(f"{d}: {total_score}")
+
+if __name__ == "__main__": main()
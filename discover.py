@@ -0,0 +1,117 @@
+import heapq
+
+# Key and inclusion-dependency discovery for schema files without annotations.
+# Candidate keys are unary columns that are non-NULL and unique. Candidate FKs
+# are unary inclusion dependencies A ⊆ B onto those keys, found by merging one
+# sorted DISTINCT stream per column (each value is seen once per column that
+# holds it) instead of joining every pair of columns.
+#
+# The backend (hw1Zain10.PgBackend or filebackend.FileBackend) provides
+# columns(t), column_types(table), key_stats(table, cols) and
+# distinct_values(table, col), a sorted stream of non-NULL values as text.
+
+NUMERIC_TYPES = {"smallint", "integer", "bigint", "numeric", "real", "double precision"}
+TEXT_TYPES = {"text", "character varying", "character", "name"}
+
+def type_family(data_type):
+    if data_type in NUMERIC_TYPES:
+        return "number"
+    if data_type in TEXT_TYPES:
+        return "text"
+    return data_type
+
+# ---------- candidate keys ----------
+def find_keys(backend, tables, cols_of):
+    """ {table: [key columns in column order]}, plus the set of non-empty columns. """
+    keys, filled = {}, set()
+    for t in tables:
+        name, cols = t["table"], cols_of[t["table"]]
+        if not cols:
+            keys[name] = []
+            continue
+        n_rows, per_col = backend.key_stats(name, cols)
+        keys[name] = [c for c in cols
+                      if n_rows > 0 and per_col[c][0] == n_rows and per_col[c][1] == n_rows]
+        filled.update((name, c) for c in cols if per_col[c][0] > 0)
+    return keys, filled
+
+# ---------- inclusion dependencies ----------
+def tagged(values, i):
+    for v in values:
+        yield v, i
+
+def find_inclusions(backend, candidates):
+    """ candidates: {dependent (table, col): set of referenced (table, col)}.
+    Returns the subset of each set that really contains every dependent value. """
+    refs = {a: set(bs) for a, bs in candidates.items() if bs}
+    columns = sorted(set(refs) | {b for bs in refs.values() for b in bs})
+    streams = [tagged(backend.distinct_values(*col), i) for i, col in enumerate(columns)]
+
+    current, holders = None, set()
+
+    def close_value():
+        # every dependent holding this value keeps only references that hold it too
+        held = {columns[i] for i in holders}
+        for a in held:
+            if a in refs:
+                refs[a] &= held
+
+    for value, i in heapq.merge(*streams):
+        if value != current:
+            if holders:
+                close_value()
+            current, holders = value, set()
+        holders.add(i)
+    if holders:
+        close_value()
+    return refs
+
+# ---------- driver ----------
+def discover(backend, tables):
+    """ Annotated copies of `tables` (same dict shape as parse_schema_line). """
+    cols_of = {t["table"]: backend.columns(t) for t in tables}
+    types = {t["table"]: backend.column_types(t["table"]) for t in tables}
+    keys, filled = find_keys(backend, tables, cols_of)
+    pk_of = {name: ks[0] for name, ks in keys.items() if ks}
+
+    key_cols = {(name, k) for name, ks in keys.items() for k in ks}
+    candidates = {}
+    for t in tables:
+        name = t["table"]
+        for c in cols_of[name]:
+            if (name, c) not in filled:
+                continue  # an all-NULL column is trivially included everywhere
+            fam = type_family(types[name].get(c))
+            candidates[(name, c)] = {
+                b for b in key_cols
+                if b != (name, c) and type_family(types[b[0]].get(b[1])) == fam}
+    refs = find_inclusions(backend, candidates)
+
+    out = []
+    for t in tables:
+        name = t["table"]
+        fks = []
+        for c in cols_of[name]:
+            found = refs.get((name, c), set())
+            # equal value sets of two primary keys say nothing about direction
+            if pk_of.get(name) == c:
+                found = {b for b in found if not (pk_of.get(b[0]) == b[1] and (name, c) in refs.get(b, ()))}
+            if not found:
+                continue
+            # prefer the referenced table's chosen PK, then the first by name
+            ref = min(found, key=lambda b: (pk_of.get(b[0]) != b[1], b))
+            fks.append({"cols": [c], "ref_table": ref[0], "ref_cols": [ref[1]]})
+        out.append({"table": name, "columns": cols_of[name],
+                    "pk": [pk_of[name]] if name in pk_of else [], "fks": fks})
+    return out
+
+def format_schema_line(t):
+    """ T1(k1(pk),k2(fk:T2.k2),A), the tc*.txt input format. """
+    fk_of = {fk["cols"][0]: fk for fk in t["fks"]}
+    parts = []
+    for c in t["columns"]:
+        tags = "(pk)" if c in t["pk"] else ""
+        if c in fk_of:
+            tags += f"(fk:{fk_of[c]['ref_table']}.{fk_of[c]['ref_cols'][0]})"
+        parts.append(c + tags)
+    return f"{t['table']}({','.join(parts)})"
@@ -0,0 +1,210 @@
+import csv, mmap, os
+from collections import Counter
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for .parquet dumps
+    pq = None
+
+# Offline backend for hw1Zain10.run_checks: evaluates the same RI and FD checks
+# on <table>.csv / <table>.parquet dumps in one directory. Each dump is read once
+# per run into Python lists of the columns the schema file names (CSV: every line
+# is decoded; Parquet: only those columns are read, then converted to lists).
+# CSV follows the COPY ... CSV HEADER convention: first line is the header, an
+# empty field is NULL. Values are compared as they appear in the dump (text for
+# CSV).
+
+DUMP_EXTS = (".csv", ".parquet")
+BYTES_PER_ROW = 64  # row-count guess from file size for the scheduler
+
+# ---------- readers ----------
+def mmap_lines(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # an empty file cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                yield line.decode("utf-8")
+
+def csv_header(path):
+    row = next(csv.reader(mmap_lines(path)), [])
+    return [c.strip().lstrip("\ufeff").lower() for c in row]
+
+def read_csv_columns(path, cols):
+    reader = csv.reader(mmap_lines(path))
+    header = [c.strip().lstrip("\ufeff").lower() for c in next(reader, [])]
+    idx = [(c, header.index(c)) for c in cols]
+    out = {c: [] for c in cols}
+    for row in reader:
+        if not row:
+            continue
+        for c, i in idx:
+            v = row[i] if i < len(row) else ""
+            out[c].append(v if v != "" else None)
+    return out
+
+def fold_key(vals):
+    # one fixed-width hash per (possibly composite) key; None if any part is NULL
+    return None if any(v is None for v in vals) else hash(vals)
+
+def parquet_header(path):
+    return [n.lower() for n in pq.read_schema(path).names]
+
+def read_parquet_columns(path, cols):
+    names = {n.lower(): n for n in pq.read_schema(path).names}
+    table = pq.read_table(path, columns=[names[c] for c in cols], memory_map=True)
+    return {c: table.column(names[c]).to_pylist() for c in cols}
+
+# ---------- backend ----------
+class FileBackend:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.paths = {}
+        self.headers = {}
+        self.cache = {}  # {table: {col: [values]}}
+        self.wanted = {}  # {table: columns the schema file names}, decoded together
+
+    def path(self, table):
+        if table not in self.paths:
+            self.paths[table] = None
+            for name in sorted(os.listdir(self.data_dir)):
+                base, ext = os.path.splitext(name)
+                if base.lower() == table and ext.lower() in DUMP_EXTS:
+                    self.paths[table] = os.path.join(self.data_dir, name)
+                    break
+        return self.paths[table]
+
+    def header(self, table):
+        if table not in self.headers:
+            p = self.path(table)
+            if p is None:
+                self.headers[table] = []
+            elif p.lower().endswith(".parquet"):
+                if pq is None:
+                    raise RuntimeError(f"pyarrow is required to read {p}")
+                self.headers[table] = parquet_header(p)
+            else:
+                self.headers[table] = csv_header(p)
+        return self.headers[table]
+
+    def load(self, table, cols):
+        """ {col: values} for the requested columns. The first miss decodes every
+        column columns(t) returned for the table as well, so a dump is parsed
+        once per run rather than once per check. """
+        have = self.cache.setdefault(table, {})
+        missing = [c for c in cols if c not in have]
+        if missing:
+            missing += [c for c in self.wanted.get(table, []) if c not in have and c not in missing]
+            p = self.path(table)
+            if p.lower().endswith(".parquet"):
+                have.update(read_parquet_columns(p, missing))
+            else:
+                have.update(read_csv_columns(p, missing))
+        return {c: have[c] for c in cols}
+
+    # --- interface used by hw1Zain10.run_checks ---
+    def validate(self, t):
+        # same reasons as check_table_exists_and_columns
+        if self.path(t["table"]) is None:
+            return False, "table-missing"
+        pk = t.get("pk")
+        if not pk:
+            return False, "pk-missing"
+        header = self.header(t["table"])
+        if any(c not in header for c in pk):
+            return False, "pkcol-missing"
+        for fk in t["fks"]:
+            for c in fk["cols"]:
+                if c not in header:
+                    return False, f"fkcol-missing:{c}"
+        return True, "ok"
+
+    def columns(self, t):
+        # only the columns named in the schema file are ever read
+        header = self.header(t["table"])
+        named = set(t.get("columns") or header)
+        cols = [c for c in header if c in named]
+        self.wanted[t["table"]] = cols
+        return cols
+
+    # --- catalog and streams for discover.py ---
+    def list_tables(self):
+        return sorted({os.path.splitext(n)[0].lower() for n in os.listdir(self.data_dir)
+                       if os.path.splitext(n)[1].lower() in DUMP_EXTS})
+
+    def column_types(self, table):
+        # CSV has no types; every column compares as text
+        return {c: "text" for c in self.header(table)}
+
+    def key_stats(self, table, cols):
+        data = self.load(table, cols)
+        n_rows = len(data[cols[0]]) if cols else 0
+        return n_rows, {c: (sum(v is not None for v in data[c]),
+                            len({v for v in data[c] if v is not None})) for c in cols}
+
+    def distinct_values(self, table, col):
+        return iter(sorted({str(v) for v in self.load(table, [col])[col] if v is not None}))
+
+    def table_stats(self, tables):
+        stats = {}
+        for t in tables:
+            p = self.path(t["table"])
+            size = os.path.getsize(p) if p else 0
+            stats[t["table"]] = {"rows": max(1.0, size / BYTES_PER_ROW), "pages": 1,
+                                 "width": {}, "distinct": {}}
+        return stats
+
+    def shard_count(self, table):
+        return 1
+
+    def partition_classes(self, table, cols, timeout_ms=None):
+        data = self.load(table, cols)
+        rep_of, first_of, unique = {}, {}, set()
+        for c in cols:
+            vals = data[c]
+            first = {}
+            # label = first row of the value's group, 0 for NULL (as in the SQL pre-pass)
+            labels = tuple(0 if v is None else first.setdefault(v, i + 1) for i, v in enumerate(vals))
+            rep_of[c] = first_of.setdefault(labels, c)
+            if len(first) + (None in vals) == len(vals):
+                unique.add(c)
+        return rep_of, unique
+
+    def run(self, chk, timeout_ms=None):
+        table = chk["table"]
+        if chk["kind"] == "ri":
+            fk = chk["fk"]
+            ref_header = self.header(fk["ref_table"]) if self.path(fk["ref_table"]) else []
+            if any(c not in ref_header for c in fk["ref_cols"]):
+                return False
+            child = self.load(table, fk["cols"])
+            parent = self.load(fk["ref_table"], fk["ref_cols"])
+            # parent keys bucketed by folded hash; a hit is verified on the tuple
+            buckets = {}
+            for key in zip(*(parent[c] for c in fk["ref_cols"])):
+                h = fold_key(key)
+                if h is not None:
+                    buckets.setdefault(h, Counter())[key] += 1
+            joined = n = 0
+            for key in zip(*(child[c] for c in fk["cols"])):
+                n += 1
+                h = fold_key(key)
+                if h is not None and h in buckets:
+                    joined += buckets[h].get(key, 0)
+            # |T| = |T join T_ref|, NULL keys never join
+            return joined == n
+        x, y = chk["x"], chk["y"]
+        data = self.load(table, [x, y])
+        groups = {}
+        for xv, yv in zip(data[x], data[y]):
+            g = groups.get(xv)
+            if g is None:
+                g = groups[xv] = [0, set()]
+            g[0] += 1
+            if yv is not None and len(g[1]) < 2:
+                g[1].add(yv)
+        # repeated X with exactly one distinct non-NULL Y: the FD X -> Y holds there
+        return any(n > 1 and len(ys) == 1 for n, ys in groups.values())
+
+    def finish(self):
+        self.cache.clear()
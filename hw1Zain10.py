@@ -1,18 +1,34 @@
-import argparse, os, re, sys 
-import psycopg2 
+import argparse, gzip, json, os, re, sys, threading, time, weakref 
+from collections import Counter 
+from concurrent.futures import ThreadPoolExecutor 
+try: 
+    import psycopg2 
+except ImportError:  # only the offline --data-dir backend works without it 
+    psycopg2 = None 
 from db_config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD 
 
 # ---------- helpers for SQL logging ---------- 
 SQL_LOG_PATH = "checkdb.sql" 
+_log_lock = threading.Lock()  # fan-out workers share one log file
 def log_sql(header, sql): 
-    with open(SQL_LOG_PATH, "a", encoding="utf-8") as f: 
+    with _log_lock, open(SQL_LOG_PATH, "a", encoding="utf-8") as f: 
         f.write(f"\n-- {header}\n") 
         f.write(sql.strip() + ";\n")
 
 # ---------- parse the input schema file ---------- 
 TABLE_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*\((.*)\)\s*$") 
-FK_RE = re.compile(r"\(fk\s*:\s*([A-Za-z_][A-Za-z0-9_]*)\s*\.\s*([A-Za-z_][A-Za-z0-9_]*)\s*\)", re.I) 
+FK_RE = re.compile(r"\(fk\s*:\s*([A-Za-z_][A-Za-z0-9_]*)\s*\.\s*(?:([A-Za-z_][A-Za-z0-9_]*)|\(([^()]*)\))\s*\)", re.I) 
 PK_TAG = "(pk)"
+# composite keys are separate entries naming their columns, e.g. 
+#   T1(a, b, c, (a,b)(pk), (b,c)(fk:T2.(x,y))) 
+# several (pk) column tags also form one composite PK 
+GROUP_RE = re.compile(r"^\(([^()]*)\)\s*(\(.*\))$")
+
+def split_names(s): 
+    return [c.strip().lower() for c in s.split(",") if c.strip()]
+
+def fk_label(table, fk): 
+    return f"{table}..{','.join(fk['cols'])} -> {fk['ref_table']}..{','.join(fk['ref_cols'])}"
 
 def smart_split_cols(inner): # split by commas not inside parentheses 
     parts, buf, depth = [], [], 0 
@@ -39,27 +55,36 @@ def parse_schema_line(line):
     inner = m.group(2) 
     
     columns = smart_split_cols(inner) 
-    pk_col = None 
+    pk_cols = [] 
     fks = [] 
     pure_cols = [] 
     
     for coldef in columns: 
         coldef_clean = coldef.strip() 
-        name_part = coldef_clean.split("(")[0].strip().lower() # <-- lower 
-        if name_part: 
-            pure_cols.append(name_part) 
+        grp = GROUP_RE.match(coldef_clean) 
+        if grp: 
+            # (a,b)(pk) / (a,b)(fk:T.(x,y)): a key over columns listed elsewhere 
+            key_cols, tag = split_names(grp.group(1)), grp.group(2) 
+        else: 
+            name_part = coldef_clean.split("(")[0].strip().lower() # <-- lower 
+            if name_part: 
+                pure_cols.append(name_part) 
+            key_cols, tag = [name_part], coldef_clean 
         # PK tag tolerant 
-        if PK_TAG in coldef_clean.replace(" ", "").lower(): 
-            pk_col = name_part 
+        if PK_TAG in tag.replace(" ", "").lower(): 
+            pk_cols = key_cols if grp else pk_cols + key_cols 
             
         # FK tag tolerant 
-        fk_m = FK_RE.search(coldef_clean) 
+        fk_m = FK_RE.search(tag) 
         if fk_m: 
             ref_table = fk_m.group(1).strip().lower() # <-- lower 
-            ref_col = fk_m.group(2).strip().lower() # <-- lower 
-            fks.append({"col": name_part, "ref_table": ref_table, "ref_col": ref_col}) 
+            ref_cols = [fk_m.group(2).strip().lower()] if fk_m.group(2) else split_names(fk_m.group(3)) 
+            if len(ref_cols) != len(key_cols): 
+                print(f"Warning: {tname}: FK {coldef_clean} has {len(key_cols)} columns but references {len(ref_cols)}; ignored", file=sys.stderr) 
+                continue 
+            fks.append({"cols": key_cols, "ref_table": ref_table, "ref_cols": ref_cols}) 
             
-    return {"table": tname, "columns": pure_cols, "pk": pk_col, "fks": fks}
+    return {"table": tname, "columns": pure_cols, "pk": pk_cols, "fks": fks}
 
 def parse_input_file(path): 
     tables = [] 
@@ -83,28 +108,180 @@ def parse_input_file(path):
     return tables
 
 # ---------- DB connection ---------- 
-def connect(): 
-    return psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+# A target is {"name": label, "conn": psycopg2.connect kwargs}; the default
+# target is the one described by db_config.py.
+CONFIG_KEYS = {"DB_HOST": "host", "DB_PORT": "port", "DB_NAME": "database",
+               "DB_USER": "user", "DB_PASSWORD": "password", "DB_SCHEMA": "schema"}
+CONFIG_RE = re.compile(r"^\s*(DB_[A-Z]+)\s*=\s*[\"']?(.*?)[\"']?\s*$")
+
+def make_target(cfg): 
+    if "dsn" in cfg: 
+        # libpq "key=value ..." string or postgresql:// URI; hide the password in labels
+        name = re.sub(r"password\s*=\s*\S+", "password=***", cfg["dsn"]) 
+        name = re.sub(r"(://[^:/@]+:)[^@]*@", r"\1***@", name) 
+        return {"name": name, "conn": {"dsn": cfg["dsn"]}} 
+    conn = dict(host=DB_HOST, port=DB_PORT, database=DB_NAME, user=DB_USER, password=DB_PASSWORD) 
+    conn.update({k: v for k, v in cfg.items() if k != "schema"}) 
+    name = f"{conn['user']}@{conn['host']}/{conn['database']}" 
+    if cfg.get("schema"): 
+        conn["options"] = f"-c search_path={cfg['schema']}" 
+        name += f":{cfg['schema']}" 
+    return {"name": name, "conn": conn}
+
+def load_targets(path): 
+    """ Read connection targets: DB_HOST = "..." blocks in the db_config.py style 
+    (a repeated key starts the next target, missing keys fall back to db_config.py) 
+    and/or one libpq DSN or URI per line. """ 
+    cfgs, block = [], None 
+    with open(path, "r", encoding="utf-8") as f: 
+        for raw in f: 
+            raw = raw.strip() 
+            if not raw or raw.startswith(("#", "--", "//")): 
+                continue 
+            m = CONFIG_RE.match(raw) 
+            if m and m.group(1) in CONFIG_KEYS: 
+                key = CONFIG_KEYS[m.group(1)] 
+                if block is None or key in block: 
+                    block = {} 
+                    cfgs.append(block) 
+                block[key] = m.group(2) 
+                continue 
+            block = None 
+            cfgs.append({"dsn": raw}) 
+    return [make_target(c) for c in cfgs]
+
+# TCP keepalives: a dead server or NAT drop surfaces as an error in about a 
+# minute instead of a hang until the OS default (hours). Values a DSN already 
+# sets win. 
+KEEPALIVES = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+
+def conn_kwargs(target=None, timeout=None): 
+    kw = dict((target or make_target({}))["conn"]) 
+    given = psycopg2.extensions.parse_dsn(kw["dsn"]) if "dsn" in kw else kw 
+    kw.update({k: v for k, v in KEEPALIVES.items() if k not in given}) 
+    if timeout: 
+        kw["connect_timeout"] = max(1, int(timeout)) 
+    return kw
+
+def connect(target=None, timeout=None): 
+    if psycopg2 is None: 
+        raise RuntimeError("psycopg2 is not installed; use --data-dir for offline checks") 
+    return psycopg2.connect(**conn_kwargs(target, timeout))
+
+# ---------- connection pools ---------- 
+# One pool per distinct target; acquire() / release() replace connect() / 
+# close() for connections that may be reused (main session, shard workers, 
+# reconnects). A released healthy connection waits on the target's idle list, 
+# so the next acquire() gets a warm session, prepared statements included, 
+# instead of a new login. The pool never caps how many are out at once. 
+_pools = {}  # target key -> {"idle": [connections], "out": ids handed out} 
+_pools_lock = threading.Lock()
+
+def acquire(target=None, timeout=None): 
+    if psycopg2 is None: 
+        raise RuntimeError("psycopg2 is not installed; use --data-dir for offline checks") 
+    target = target or make_target({}) 
+    key = repr(sorted(target["conn"].items())) 
+    conn = None 
+    with _pools_lock: 
+        entry = _pools.setdefault(key, {"idle": [], "out": set()}) 
+        while entry["idle"] and conn is None: 
+            conn = entry["idle"].pop() 
+            if conn.closed: 
+                conn = None 
+    if conn is None: 
+        conn = connect(target, timeout) 
+    with _pools_lock: 
+        entry["out"].add(id(conn)) 
+    return conn
+
+def release(conn, broken=False): 
+    """ Give conn back to its pool's idle list (closed instead if broken, dead 
+    or not clean); a connection from connect() is just closed. """ 
+    with _pools_lock: 
+        entry = next((e for e in _pools.values() if id(conn) in e["out"]), None) 
+        if entry is not None: 
+            entry["out"].discard(id(conn)) 
+    if entry is None or broken or conn.closed: 
+        conn.close() 
+        return 
+    try: 
+        status = conn.get_transaction_status() 
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN: 
+            conn.close() 
+            return 
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE: 
+            conn.rollback() 
+    except psycopg2.Error: 
+        conn.close() 
+        return 
+    with _pools_lock: 
+        entry["idle"].append(conn)
+
+def close_pools(): 
+    with _pools_lock: 
+        for entry in _pools.values(): 
+            for conn in entry["idle"]: 
+                conn.close() 
+        _pools.clear()
 
 # ---------- SQL helpers ---------- 
 def q_count_all(table): 
     return f"SELECT COUNT(*) FROM {table}" 
 
-def q_count_join_left_on_fk(left, fk_col, right, right_pk): 
-    return ("SELECT COUNT(*) " f"FROM {left} INNER JOIN {right} ON {left}.{fk_col} = {right}.{right_pk}")
+def key_join_cond(left, fk_cols, right, ref_cols): 
+    # column-wise equality: the planner hashes or merges on all clauses at once, 
+    # equal-but-differently-printed values (1.0 / 1.00) still match, and NULL in 
+    # any key column never matches 
+    return " AND ".join(f"{left}.{a} = {right}.{b}" for a, b in zip(fk_cols, ref_cols))
+
+def q_count_join_left_on_fk(left, fk_cols, right, ref_cols): 
+    # the parent gets an alias so a self-referencing FK (emp.boss -> emp.id) 
+    # does not name the same table twice 
+    return ("SELECT COUNT(*) " 
+            f"FROM {left} INNER JOIN {right} checkdb_ref ON {key_join_cond(left, fk_cols, 'checkdb_ref', ref_cols)}")
+
+def q_ri_holds(left, fk_cols, right, ref_cols): 
+    # one round trip per FK: |T| = |T ⋈ FK T_ref| 
+    return (f"SELECT ({q_count_all(left)}) = ({q_count_join_left_on_fk(left, fk_cols, right, ref_cols)})")
+
+# ---------- shard predicates (intra-table parallel scans) ---------- 
+def ctid_range(table, lo_page, hi_page): 
+    # heap pages [lo_page, hi_page); hi_page None = to the end of the table 
+    pred = f"{table}.ctid >= '({lo_page},0)'::tid" 
+    if hi_page is not None: 
+        pred += f" AND {table}.ctid < '({hi_page},0)'::tid" 
+    return pred
+
+def page_shards(table, pages, n): 
+    """ n contiguous heap page ranges; the last one is open-ended. """ 
+    step = -(-pages // n) 
+    return [ctid_range(table, i * step, (i + 1) * step if i < n - 1 else None) for i in range(n)]
+
+def q_ri_counts(left, fk_cols, right, ref_cols, where_sql): 
+    # partial |T| and |T ⋈ FK T_ref| over one shard of T; summed on the client 
+    return (
+        f"SELECT ({q_count_all(left)} WHERE {where_sql}), "
+        f"({q_count_join_left_on_fk(left, fk_cols, right, ref_cols)} WHERE {where_sql})")
+
+def q_fd_partials(table, x, y, where_sql): 
+    # per-group partials over one shard of T; a group can span shards, so the 
+    # client merges them (merge_fd_partials) before applying the HAVING test 
+    return (f"SELECT {x}, COUNT(*), COUNT({y}), MIN({y}), MAX({y}) " 
+            f"FROM {table} WHERE {where_sql} GROUP BY {x}")
 
 def q_exists_rows(table, where_sql): 
     return f"SELECT EXISTS(SELECT 1 FROM {table} WHERE {where_sql} LIMIT 1)" 
 
-def q_exists_fd_violation(table, x, y):
+def q_exists_fd_violation(table, x, y, where_sql=None):
     # FD X→Y exists for some repeated X if:
     # - COUNT(*) > 1  (the determinant value repeats)
     # - At least one non-NULL Y in that group
     # - MIN(Y) IS NOT DISTINCT FROM MAX(Y) (NULL-safe "all equal")
+    where = f" WHERE {where_sql}" if where_sql else ""
     return (
         "SELECT EXISTS ("
-        f"  SELECT 1 FROM {table} "
+        f"  SELECT 1 FROM {table}{where} "
         f"  GROUP BY {x} "
         f"  HAVING COUNT(*) > 1 "
         f"     AND COUNT({y}) FILTER (WHERE {y} IS NOT NULL) > 0 "
@@ -113,20 +290,89 @@ def q_exists_fd_violation(table, x, y):
     )
 
 
+def q_partition_fingerprints(table, cols):
+    # One scan: number every row once, label each row by the first row number of
+    # its group per column (NULLs get label 0), then fingerprint each column's
+    # (row, label) pairs with two order-independent sums of 64-bit hashes
+    # (numeric sums: no overflow, no table-sized text value). Equal
+    # fingerprints <=> identical partitions and NULL positions, so GROUP
+    # BY/MIN/MAX answers are the same for those columns.
+    labels = ", ".join(
+        f"CASE WHEN {c} IS NULL THEN 0 ELSE min(rn) OVER (PARTITION BY {c}) END AS f{i}, "
+        f"min(rn) OVER (PARTITION BY {c}) AS g{i}" for i, c in enumerate(cols))
+    # the row number seeds the hash of its label (hashint8 XOR-folds the two
+    # 32-bit halves, so packing rn and label into one int8 would collide)
+    aggs = ", ".join(
+        f"SUM(hashint8extended(f{i}, rn)), SUM(hashint8extended(f{i}, -rn)), "
+        f"COUNT(DISTINCT g{i})" for i in range(len(cols)))
+    return (
+        f"SELECT COUNT(*), {aggs} FROM ("
+        f"  SELECT rn, {labels} FROM ("
+        f"    SELECT row_number() OVER () AS rn, {', '.join(cols)} FROM {table}) r"
+        ") p"
+    )
+
+def q_encode_table(table, cols, enc_name): 
+    # narrow copy for the FD phase: every column becomes an int code, dense-ranked 
+    # once per column. Codes are equal exactly when values are, and NULL stays 
+    # NULL, so GROUP BY / MIN / MAX answers are unchanged. 
+    codes = ", ".join( 
+        f"(CASE WHEN {c} IS NULL THEN NULL ELSE dense_rank() OVER (ORDER BY {c}) END)::int AS {c}" 
+        for c in cols) 
+    return f"CREATE TEMP TABLE {enc_name} AS SELECT {codes} FROM {table}"
+
+def q_orphan_rows(left, fk_cols, right, ref_cols): 
+    # child rows with no partner in T_ref (NULL FKs included, as in the join count); 
+    # the parent is aliased so a self-referencing FK does not shadow the child 
+    return (f"SELECT {left}.* FROM {left} WHERE NOT EXISTS (" 
+            f"SELECT 1 FROM {right} checkdb_ref WHERE {key_join_cond(left, fk_cols, 'checkdb_ref', ref_cols)})")
+
+def q_fd_groups(table, x, y): 
+    # the repeated-X groups q_exists_fd_violation stops at, one line per group 
+    return (
+        f"SELECT {x} AS determinant, MIN({y}) AS dependent, COUNT(*) AS n_rows "
+        f"FROM {table} "
+        f"GROUP BY {x} "
+        f"HAVING COUNT(*) > 1 "
+        f"   AND COUNT({y}) FILTER (WHERE {y} IS NOT NULL) > 0 "
+        f"   AND MIN({y}) IS NOT DISTINCT FROM MAX({y})"
+    )
+
 def q_table_has_column(table, col): 
     return (
         "SELECT EXISTS (" 
         " SELECT 1 FROM information_schema.columns " 
         f" WHERE table_name = '{table.lower()}' AND column_name = '{col.lower()}'" 
+        " AND table_schema = ANY (current_schemas(false))" 
         ")" 
         )
 
+# ---------- prepared catalog queries ---------- 
+# Fixed-shape catalog lookups run once per table, so each is PREPAREd once per 
+# session and EXECUTEd after that: the server skips parse and plan on every 
+# later call. Prepared statements belong to the session, not the transaction, 
+# so a rollback keeps them; a new connection (e.g. after a reconnect) starts 
+# with none. 
+CATALOG_STMTS = { 
+    "checkdb_columns": ("text", 
+        "SELECT column_name FROM information_schema.columns " 
+        "WHERE table_name = $1 AND table_schema = ANY (current_schemas(false)) " 
+        "ORDER BY ordinal_position"), 
+    "checkdb_regclass": ("text", "SELECT to_regclass($1)"), 
+    } 
+_prepared = weakref.WeakKeyDictionary()  # connection -> statement names PREPAREd on it
+
+def execute_prepared(cur, name, *args): 
+    names = _prepared.setdefault(cur.connection, set()) 
+    if name not in names: 
+        types, sql = CATALOG_STMTS[name] 
+        cur.execute(f"PREPARE {name} ({types}) AS {sql}") 
+        names.add(name) 
+    cur.execute(f"EXECUTE {name} (" + ", ".join(["%s"] * len(args)) + ")", args)
+
 def get_actual_columns(cur, table): 
     """ Return the actual column names from the DB for table, in order. """ 
-    cur.execute(
-        "SELECT column_name FROM information_schema.columns " 
-        "WHERE table_name = %s ORDER BY ordinal_position", 
-        (table.lower(),) ) 
+    execute_prepared(cur, "checkdb_columns", table.lower()) 
     return [r[0] for r in cur.fetchall()]
 
 # ---------- checks ---------- 
@@ -136,81 +382,807 @@ def safe_fetch_bool(cur, sql, header):
     v = cur.fetchone()[0] 
     return bool(v) 
 
-def safe_fetch_int(cur, sql, header): 
-    log_sql(header, sql) 
-    cur.execute(sql) 
-    return int(cur.fetchone()[0]) 
-
 def check_table_exists_and_columns(cur, t): 
     # table must exist 
-    cur.execute("SELECT to_regclass(%s)", (t["table"],)) 
+    execute_prepared(cur, "checkdb_regclass", t["table"]) 
     if cur.fetchone()[0] is None: 
         return False, "table-missing" 
     
-    # PK must be present in input and exist as a column 
+    # PK must be present in input and exist as a column (every column of a composite PK) 
     pk = t.get("pk") 
     if not pk: 
         return False, "pk-missing"
-    if not safe_fetch_bool(cur, q_table_has_column(t["table"], pk), f"check pkcol {t['table']}.{pk}"): 
-        return False, "pkcol-missing" 
+    for c in pk: 
+        if not safe_fetch_bool(cur, q_table_has_column(t["table"], c), f"check pkcol {t['table']}.{c}"): 
+            return False, "pkcol-missing" 
     
     # If FKs exist: the FK column on THIS table must exist. 
     # (Do NOT hard-fail on referenced table/col; the RI check will reflect it.) 
     for fk in t["fks"]: 
-        if not safe_fetch_bool(cur, q_table_has_column(t["table"], fk["col"]), f"check fkcol {t['table']}.{fk['col']}"): 
-            return False, f"fkcol-missing:{fk['col']}" 
+        for c in fk["cols"]: 
+            if not safe_fetch_bool(cur, q_table_has_column(t["table"], c), f"check fkcol {t['table']}.{c}"): 
+                return False, f"fkcol-missing:{c}" 
     return True, "ok"
 
-def check_referential_integrity(cur, t): 
-    # Tables without FK are trivially Y:contentReference[oaicite:7]{index=7} 
-    if not t["fks"]: 
-        return True 
-    # For each FK, compare |T| with |T ⋈ FK T_ref| 
-    n_all = safe_fetch_int(cur, q_count_all(t["table"]), f"count {t['table']}") 
-    for fk in t["fks"]: 
-        join_n = safe_fetch_int( 
-            cur, 
-            q_count_join_left_on_fk(t["table"], fk["col"], fk["ref_table"], fk["ref_col"]), 
-            f"count join {t['table']}..{fk['col']} -> {fk['ref_table']}..{fk['ref_col']}" ) 
-        if join_n != n_all: 
-            return False 
-    return True
-
-def check_normalization_3nf_bcnf(cur, t):
-    cols = [c.lower() for c in get_actual_columns(cur, t["table"])]
+def fd_pairs(cols, t):
+    """ The (X, Y) pairs the normalization check has to query for table t. """
     if not cols:
-        return True
+        return []
 
-    pk = (t.get("pk") or "").lower()
-    if pk not in cols:
-        pk = cols[0]
+    pk = [c for c in (t.get("pk") or []) if c in cols]
+    if not pk:
+        pk = [cols[0]]
 
-    non_pk_cols = [c for c in cols if c != pk]
+    non_pk_cols = [c for c in cols if c not in pk]
 
-    # NEW: build a set of FK columns for this table
-    fk_cols = { fk["col"].lower() for fk in t.get("fks", []) }
+    # NEW: build a set of FK columns for this table (every column of a composite FK)
+    fk_cols = { c for fk in t.get("fks", []) for c in fk["cols"] }
 
     # Only check FDs where:
     # - X is a non-PK column AND not an FK column
     # - Y is a non-PK column (as before; ignore X→PK)
+    pairs = []
     for x in non_pk_cols:
         if x in fk_cols:
             continue  # skip FK determinants
         for y in non_pk_cols:
             if y == x:
                 continue
-            sql = q_exists_fd_violation(t["table"], x, y)
-            if safe_fetch_bool(cur, sql, f"FD check {t['table']}: {x} -> {y}"):
-                return False
-    return True
-        
+            pairs.append((x, y))
+    return pairs
+
+# ---------- scheduling: cheapest, highest-yield checks first ---------- 
+DEFAULT_WIDTH = 32  # bytes assumed for a column pg_stats knows nothing about 
+
+def get_table_stats(cur, tables): 
+    """ Planner statistics for every table in two catalog queries: 
+    {table: {"rows": n, "width": {col: bytes}, "distinct": {col: n}}}. """ 
+    names = [t["table"] for t in tables] 
+    stats = {n: {"rows": 1.0, "pages": 1, "width": {}, "distinct": {}} for n in names} 
+    cur.execute( 
+        "SELECT c.relname, c.reltuples, c.relpages FROM pg_class c " 
+        "JOIN pg_namespace n ON n.oid = c.relnamespace " 
+        "WHERE n.nspname = ANY (current_schemas(false)) AND c.relname = ANY (%s)", (names,)) 
+    for relname, reltuples, relpages in cur.fetchall(): 
+        # reltuples is -1 (or 0) before the first ANALYZE; guess from the page count 
+        stats[relname]["rows"] = float(reltuples) if reltuples and reltuples > 0 else max(1.0, relpages * 100.0) 
+        stats[relname]["pages"] = max(1, relpages) 
+    cur.execute( 
+        "SELECT tablename, attname, avg_width, n_distinct FROM pg_stats " 
+        "WHERE schemaname = ANY (current_schemas(false)) AND tablename = ANY (%s)", (names,)) 
+    for tname, col, width, n_distinct in cur.fetchall(): 
+        s = stats[tname] 
+        s["width"][col] = width or DEFAULT_WIDTH 
+        # negative n_distinct is a fraction of the row count 
+        s["distinct"][col] = -n_distinct * s["rows"] if n_distinct < 0 else n_distinct 
+    return stats
+
+def estimate_fd_cost(st, x, y): 
+    """ Scan cost divided by the chance the check decides the table. Repeated 
+    determinant values with many small groups are the most likely to expose an 
+    FD; a (nearly) unique determinant has no repeated group to find. """ 
+    rows = st["rows"] 
+    cost = rows * (st["width"].get(x, DEFAULT_WIDTH) + st["width"].get(y, DEFAULT_WIDTH)) 
+    ratio = min(1.0, st["distinct"].get(x, rows / 2) / rows) 
+    yield_ = ratio if ratio < 0.99 else 0.05 
+    return cost / max(yield_, 0.01)
+
+def partition_classes(cur, table, cols, session, timeout_ms=None): 
+    """ Map every column to the representative of its partition-equivalence class 
+    and return the set of columns whose groups are all single rows. Returns 
+    (None, set()) if the pre-pass fails or times out, i.e. every column is its 
+    own class. """ 
+    sql = q_partition_fingerprints(table, cols) 
+    set_timeout(cur, session, timeout_ms) 
+    log_sql(f"partition fingerprints {table}", sql) 
+    try: 
+        cur.execute(sql) 
+        row = cur.fetchone() 
+    except psycopg2.Error: 
+        cur.connection.rollback() 
+        session.pop("timeout", None)  # a rolled-back SET is gone too 
+        return None, set() 
+    n_rows, rep_of, first = row[0], {}, {} 
+    unique = set() 
+    for i, c in enumerate(cols): 
+        fp, n_groups = (row[1 + 3 * i], row[2 + 3 * i]), row[3 + 3 * i] 
+        rep_of[c] = first.setdefault(fp, c) 
+        if n_groups == n_rows: 
+            unique.add(c) 
+    return rep_of, unique
+
+def class_fd_pairs(backend, table, cols, pairs, timeout_ms=None): 
+    """ Collapse FD pairs onto partition classes: X -> Y has the same answer as 
+    rep(X) -> rep(Y), and a determinant with no repeated group never violates. """ 
+    rep_of, unique = backend.partition_classes(table, cols, timeout_ms) 
+    if rep_of is None: 
+        return pairs 
+    out = [] 
+    for x, y in pairs: 
+        if x in unique: 
+            continue 
+        p = (rep_of[x], rep_of[y]) 
+        if p not in out: 
+            out.append(p) 
+    return out
+
+def plan_checks(backend, tables, exists, opts=None, deadline=None): 
+    opts = opts or {} 
+    stats = backend.table_stats(tables) 
+    checks = [] 
+    for t in tables: 
+        name = t["table"] 
+        st = stats[name] 
+        n = backend.shard_count(name) 
+        if exists[name]: 
+            for fk in t["fks"]: 
+                ref = stats.get(fk["ref_table"], {"rows": 1.0}) 
+                checks.append({ 
+                    "table": name, "kind": "ri", "fk": fk, 
+                    "cost": (st["rows"] + ref["rows"]) / n, 
+                    "header": f"RI check {fk_label(name, fk)}"}) 
+        cols = backend.columns(t) 
+        pairs = fd_pairs(cols, t) 
+        if pairs and opts.get("partition_classes"): 
+            # the pre-pass is a full scan too: same per-statement limit and budget 
+            timeout_ms = statement_limit(opts, deadline) 
+            if timeout_ms is not None: 
+                pairs = class_fd_pairs(backend, name, cols, pairs, timeout_ms) 
+        for x, y in pairs: 
+            checks.append({ 
+                "table": name, "kind": "fd", "x": x, "y": y, 
+                "cost": estimate_fd_cost(st, x, y) / n, 
+                "header": f"FD check {name}: {x} -> {y}"}) 
+    checks.sort(key=lambda c: c["cost"]) 
+    return checks
+
+# SQLSTATEs of a check naming a table or column that does not exist 
+MISSING_OBJECT = ("42P01", "42703")  # undefined_table, undefined_column 
+
+TIMEOUT_SLACK = 0.1  # a session limit up to 10% above the wanted one is kept 
+
+def set_timeout(cur, session, timeout_ms=None): 
+    """ SET statement_timeout unless the session already has that value, or 
+    one at most TIMEOUT_SLACK above it: under --budget the limit shrinks before 
+    every check, and re-SETting it each time would double the round trips. 
+    Returns the limit the session actually has. """ 
+    timeout_ms = int(timeout_ms) if timeout_ms else 0 
+    current = session.get("timeout") 
+    if current is not None and timeout_ms and timeout_ms <= current <= timeout_ms * (1 + TIMEOUT_SLACK): 
+        return current 
+    if current != timeout_ms: 
+        cur.execute("SET statement_timeout = %s", (timeout_ms,)) 
+        session["timeout"] = timeout_ms 
+    return timeout_ms
+
+def run_check(cur, chk, session, timeout_ms=None): 
+    """ True/False for a finished check, None when it hit statement_timeout or 
+    failed for any reason other than a missing table/column. """ 
+    timeout_ms = set_timeout(cur, session, timeout_ms) 
+    try: 
+        return safe_fetch_bool(cur, chk["sql"], chk["header"]) 
+    except psycopg2.extensions.QueryCanceledError: 
+        log_sql(f"{chk['header']}: cancelled after {timeout_ms} ms", "-- unknown") 
+        cur.connection.rollback() 
+        session.pop("timeout", None)  # a rolled-back SET is gone too 
+        return None 
+    except psycopg2.ProgrammingError as e: 
+        # the referenced table/column does not exist: that FK cannot hold; any 
+        # other error (a type without equality, ...) leaves the answer unknown 
+        log_sql(f"{chk['header']}: {str(e).strip().splitlines()[0]}", "-- error") 
+        cur.connection.rollback() 
+        session.pop("timeout", None) 
+        return False if chk["kind"] == "ri" and e.pgcode in MISSING_OBJECT else None
+
+# ---------- sharded checks under one exported snapshot ---------- 
+def open_shard_pool(target, n): 
+    """ One exporting transaction plus n worker connections that import its 
+    snapshot, so every shard of every table sees the same data. """ 
+    exporter = acquire(target) 
+    exporter.set_session(isolation_level="REPEATABLE READ", readonly=True) 
+    ecur = exporter.cursor() 
+    ecur.execute("SELECT pg_export_snapshot()") 
+    pool = {"exporter": exporter, "snapshot": ecur.fetchone()[0], "workers": [], "joined": []} 
+    for _ in range(n): 
+        w = acquire(target) 
+        w.set_session(isolation_level="REPEATABLE READ", readonly=True) 
+        pool["workers"].append(w) 
+        pool["joined"].append(False) 
+    return pool
+
+def close_shard_pool(pool): 
+    for conn in pool["workers"] + [pool["exporter"]]: 
+        try: 
+            conn.rollback() 
+            conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT") 
+            release(conn) 
+        except psycopg2.Error: 
+            release(conn, broken=True)
+
+def run_shard(pool, i, sql, header, timeout_ms, handle=None): 
+    """ handle(cur) (default: the first row) after one shard query; "cancelled", 
+    "missing" (table/column does not exist) or "error" when it did not finish. """ 
+    conn = pool["workers"][i] 
+    cur = conn.cursor() 
+    try: 
+        if not pool["joined"][i]: 
+            # must be the first statement of the worker's transaction 
+            cur.execute("SET TRANSACTION SNAPSHOT %s", (pool["snapshot"],)) 
+            pool["joined"][i] = True 
+        cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms or 0),)) 
+        log_sql(f"{header} [shard {i + 1}/{len(pool['workers'])}]", sql) 
+        cur.execute(sql) 
+        return handle(cur) if handle else cur.fetchone() 
+    except psycopg2.extensions.QueryCanceledError: 
+        status = "cancelled" 
+    except psycopg2.Error as e: 
+        status = "missing" if e.pgcode in MISSING_OBJECT else "error" 
+    conn.rollback() 
+    pool["joined"][i] = False  # re-import the snapshot in the next transaction 
+    return status
+
+def group_key(v): 
+    # psycopg2 hands arrays back as lists and bytea as memoryview; make them hashable 
+    if isinstance(v, list): 
+        return tuple(group_key(e) for e in v) 
+    if isinstance(v, memoryview): 
+        return bytes(v) 
+    return v
+
+def merge_fd_partials(groups, rows): 
+    """ Fold (x, rows, non-NULL ys, min y, max y) partials into 
+    groups[x] = [rows, non-NULL ys, the one y seen, mixed]. Only equality of 
+    y values is used, so client and server ordering never have to agree. """ 
+    for xv, n, ny, lo, hi in rows: 
+        g = groups.setdefault(group_key(xv), [0, 0, None, False]) 
+        g[0] += n 
+        if ny: 
+            if lo != hi or (g[1] and g[2] != lo): 
+                g[3] = True 
+            g[1] += ny 
+            g[2] = lo
+
+def run_check_sharded(pool, chk, timeout_ms=None): 
+    """ Same contract as run_check; partial results are merged here: RI sums the 
+    per-shard |T| and join counts, FD merges per-group partials and then asks 
+    the q_exists_fd_violation question (repeated X, one distinct non-NULL Y). """ 
+    groups, lock = {}, threading.Lock() 
+
+    def merge(cur): 
+        rows = cur.fetchall() 
+        with lock: 
+            merge_fd_partials(groups, rows) 
+        return True 
+
+    handle = merge if chk["kind"] == "fd" else None 
+    with ThreadPoolExecutor(max_workers=len(chk["shards"])) as ex: 
+        parts = list(ex.map(lambda a: run_shard(pool, a[0], a[1], chk["header"], timeout_ms, handle), 
+                            enumerate(chk["shards"]))) 
+    if "missing" in parts: 
+        return False if chk["kind"] == "ri" else None 
+    if "error" in parts or "cancelled" in parts: 
+        return None 
+    if chk["kind"] == "ri": 
+        return sum(p[0] for p in parts) == sum(p[1] for p in parts) 
+    return any(n > 1 and ny > 0 and not mixed for n, ny, _, mixed in groups.values())
+
+# ---------- backends ---------- 
+# The scheduler only talks to a backend: validate(t), columns(t), 
+# table_stats(tables), shard_count(table), partition_classes(table, cols, timeout_ms), 
+# run(chk, timeout_ms) -> True/False/None and finish(); run_checks also sets 
+# backend.deadline (end of the --budget, time.monotonic(), or None). PgBackend 
+# runs the SQL above on a live connection; filebackend.FileBackend reads dumps 
+# offline. 
+RECONNECT_TRIES = 3 
+RECONNECT_DELAY = 1.0  # seconds before the first reconnect, doubled after each
+
+class PgBackend: 
+    def __init__(self, cur, opts=None): 
+        self.cur = cur 
+        self.opts = opts or {} 
+        self.session = {} 
+        self.pool = None 
+        self.stats = {} 
+        self.cols = {} 
+        self.encoded = {}  # table -> relation the FD phase reads 
+        self.deadline = None  # set by run_checks 
+
+    # --- surviving a dropped connection --- 
+    def lost(self): 
+        conns = [self.cur.connection] 
+        if self.pool is not None: 
+            conns += self.pool["workers"] + [self.pool["exporter"]] 
+        return any(c.closed for c in conns) 
+
+    def reconnect(self, attempt): 
+        """ Swap in a fresh session; its state (statement_timeout, encoded 
+        temp tables, the shard snapshot) is rebuilt on demand. """ 
+        log_sql(f"connection lost; reconnect {attempt}/{RECONNECT_TRIES}", "-- reconnect") 
+        if self.pool is not None: 
+            close_shard_pool(self.pool) 
+            self.pool = None 
+        release(self.cur.connection, broken=True) 
+        time.sleep(RECONNECT_DELAY * 2 ** (attempt - 1)) 
+        self.cur = acquire(self.opts.get("target")).cursor() 
+        self.session = {} 
+        self.encoded = {} 
+
+    def retry(self, fn): 
+        """ fn(), run again on a new connection when the old one dropped; 
+        any other error, or running out of attempts, is raised. """ 
+        for attempt in range(RECONNECT_TRIES + 1): 
+            try: 
+                if attempt: 
+                    self.reconnect(attempt) 
+                return fn() 
+            except psycopg2.Error: 
+                if attempt == RECONNECT_TRIES or not self.lost(): 
+                    raise 
+
+    def validate(self, t): 
+        return self.retry(lambda: check_table_exists_and_columns(self.cur, t)) 
+
+    def columns(self, t): 
+        if t["table"] not in self.cols: 
+            names = self.retry(lambda: get_actual_columns(self.cur, t["table"])) 
+            self.cols[t["table"]] = [c.lower() for c in names] 
+        return self.cols[t["table"]] 
+
+    # --- catalog and streams for discover.py --- 
+    def list_tables(self): 
+        return self.retry(self._list_tables) 
+
+    def _list_tables(self): 
+        self.cur.execute( 
+            "SELECT table_name FROM information_schema.tables " 
+            "WHERE table_schema = ANY (current_schemas(false)) AND table_type = 'BASE TABLE' " 
+            "ORDER BY table_name") 
+        return [r[0].lower() for r in self.cur.fetchall()] 
+
+    def column_types(self, table): 
+        return self.retry(lambda: self._column_types(table)) 
+
+    def _column_types(self, table): 
+        self.cur.execute( 
+            "SELECT column_name, data_type FROM information_schema.columns " 
+            "WHERE table_name = %s AND table_schema = ANY (current_schemas(false))", (table,)) 
+        return {c.lower(): dt for c, dt in self.cur.fetchall()} 
+
+    def key_stats(self, table, cols): 
+        """ (row count, {col: (non-NULL count, distinct count)}) in one scan. If 
+        that fails (COUNT(DISTINCT) over a type without equality, e.g. json or 
+        point) the columns are counted one by one; a column that cannot be 
+        compared gets distinct count None, i.e. it is never a key. """ 
+        sql = f"SELECT COUNT(*), " + ", ".join(f"COUNT({c}), COUNT(DISTINCT {c})" for c in cols) + f" FROM {table}" 
+        log_sql(f"key stats {table}", sql) 
+        try: 
+            row = self.retry(lambda: self._fetchone(sql)) 
+        except psycopg2.ProgrammingError: 
+            self.cur.connection.rollback() 
+            return self._key_stats_by_column(table, cols) 
+        return row[0], {c: (row[1 + 2 * i], row[2 + 2 * i]) for i, c in enumerate(cols)} 
+
+    def _key_stats_by_column(self, table, cols): 
+        n_rows = self.retry(lambda: self._fetchone(q_count_all(table)))[0] 
+        per_col = {} 
+        for c in cols: 
+            try: 
+                per_col[c] = tuple(self.retry(lambda: self._fetchone( 
+                    f"SELECT COUNT({c}), COUNT(DISTINCT {c}) FROM {table}"))) 
+            except psycopg2.ProgrammingError as e: 
+                log_sql(f"key stats {table}.{c}: {str(e).strip().splitlines()[0]}", "-- not a key") 
+                self.cur.connection.rollback() 
+                per_col[c] = (self.retry(lambda: self._fetchone(f"SELECT COUNT({c}) FROM {table}"))[0], None) 
+        return n_rows, per_col 
+
+    def _fetchone(self, sql): 
+        self.cur.execute(sql) 
+        return self.cur.fetchone() 
+
+    def distinct_values(self, table, col): 
+        # server-side cursor: the sorted stream never sits in client memory; 
+        # "C" collation = byte order, the order Python compares the strings in 
+        sql = (f"SELECT DISTINCT {col}::text COLLATE \"C\" FROM {table} " 
+               f"WHERE {col} IS NOT NULL ORDER BY 1") 
+        log_sql(f"distinct stream {table}.{col}", sql) 
+        cur = self.cur.connection.cursor(name=f"checkdb_ind_{table}_{col}") 
+        cur.itersize = 10000 
+        cur.execute(sql) 
+        try: 
+            for (v,) in cur: 
+                yield v 
+        finally: 
+            cur.close() 
+
+    def fd_table(self, table, timeout_ms=None): 
+        """ The dictionary-encoded temp projection of table when --encode is on 
+        (built on first use, under timeout_ms), else table itself. Sharded 
+        tables keep the heap: worker sessions cannot see this session's temp 
+        tables. """ 
+        if not self.opts.get("encode") or self.shard_count(table) > 1: 
+            return table 
+        if table not in self.encoded: 
+            enc = f"checkdb_enc_{table}" 
+            sql = q_encode_table(table, self.columns({"table": table}), enc) 
+            conn = self.cur.connection 
+            try: 
+                set_timeout(self.cur, self.session, timeout_ms) 
+                log_sql(f"encode {table}", sql) 
+                self.cur.execute(f"DROP TABLE IF EXISTS pg_temp.{enc}") 
+                self.cur.execute(sql) 
+                self.cur.execute(f"ANALYZE {enc}") 
+                if not conn.autocommit: 
+                    conn.commit()  # a later cancelled check must not roll the table back 
+                self.encoded[table] = enc 
+            except psycopg2.Error: 
+                conn.rollback()  # e.g. a column type without ordering, or out of time; use the heap 
+                self.session.pop("timeout", None) 
+                self.encoded[table] = table 
+        return self.encoded[table] 
+
+    def fd_relation(self, table, timeout_ms): 
+        """ (fd_table(table), statement_timeout for the statement that reads it). 
+        A first-use build is charged to the run budget only, not to the check 
+        that triggered it: the check then gets a fresh statement_limit (None 
+        once the budget is spent), on the heap if the build was cancelled. """ 
+        if not self.opts.get("encode") or table in self.encoded: 
+            return self.fd_table(table, timeout_ms), timeout_ms 
+        build_ms = statement_limit({}, self.deadline) 
+        if build_ms is None: 
+            return table, None 
+        rel = self.fd_table(table, build_ms) 
+        return rel, statement_limit(self.opts, self.deadline) 
+
+    def table_stats(self, tables): 
+        self.stats = self.retry(lambda: get_table_stats(self.cur, tables)) 
+        return self.stats 
+
+    def shard_count(self, table): 
+        n = self.opts.get("shards") or 1 
+        if n > 1 and self.stats[table]["rows"] < (self.opts.get("shard_min_rows") or 0): 
+            return 1 
+        return n 
+
+    def partition_classes(self, table, cols, timeout_ms=None): 
+        return self.retry(lambda: self._partition_classes(table, cols, timeout_ms)) 
+
+    def _partition_classes(self, table, cols, timeout_ms): 
+        rel, timeout_ms = self.fd_relation(table, timeout_ms) 
+        if timeout_ms is None: 
+            return None, set() 
+        return partition_classes(self.cur, rel, cols, self.session, timeout_ms) 
+
+    def run(self, chk, timeout_ms=None): 
+        return self.retry(lambda: self.run_once(chk, timeout_ms)) 
+
+    def run_once(self, chk, timeout_ms=None): 
+        name, n = chk["table"], self.shard_count(chk["table"]) 
+        if chk["kind"] == "ri": 
+            fk = chk["fk"] 
+            args = (name, fk["cols"], fk["ref_table"], fk["ref_cols"]) 
+            chk = dict(chk, sql=q_ri_holds(*args)) 
+            if n > 1: 
+                chk["shards"] = [q_ri_counts(*args, w) for w in page_shards(name, self.stats[name]["pages"], n)] 
+        else: 
+            x, y = chk["x"], chk["y"] 
+            rel, timeout_ms = self.fd_relation(name, timeout_ms) 
+            if timeout_ms is None: 
+                return None 
+            chk = dict(chk, sql=q_exists_fd_violation(rel, x, y)) 
+            if n > 1: 
+                # each worker reads only its own heap pages; groups merge on the client 
+                chk["shards"] = [q_fd_partials(name, x, y, w) for w in page_shards(name, self.stats[name]["pages"], n)] 
+        if n > 1: 
+            if self.pool is None: 
+                self.pool = open_shard_pool(self.opts.get("target"), n) 
+            return run_check_sharded(self.pool, chk, timeout_ms) 
+        return run_check(self.cur, chk, self.session, timeout_ms) 
+
+    def finish(self): 
+        if self.pool is not None: 
+            close_shard_pool(self.pool) 
+            self.pool = None 
+        if self.cur.connection.closed: 
+            return  # nothing left to clean up on a dead session 
+        if self.session.get("timeout"): 
+            self.cur.execute("SET statement_timeout = 0") 
+            self.session.pop("timeout") 
+        for table, enc in self.encoded.items(): 
+            if enc != table: 
+                self.cur.execute(f"DROP TABLE IF EXISTS pg_temp.{enc}") 
+        self.encoded = {} 
+
+# ---------- progress checkpoints (--resume) ---------- 
+# One JSON line per finished table: its schema definition, answers and the 
+# checks that decided an N. A record only counts for a table whose definition 
+# is unchanged. 
+def load_progress(path, tables): 
+    if not path or not os.path.exists(path): 
+        return {} 
+    defs = {t["table"]: json.loads(json.dumps(t)) for t in tables} 
+    done = {} 
+    with open(path, "r", encoding="utf-8") as f: 
+        for line in f: 
+            try: 
+                rec = json.loads(line) 
+            except ValueError: 
+                continue  # a line cut short by the interrupted run 
+            if defs.get(rec.get("table")) == rec.get("def"): 
+                done[rec["table"]] = rec 
+    return done
+
+def save_progress(path, t, st, failed): 
+    rec = {"table": t["table"], "def": t, "ri": st["ri"], "fd": st["fd"], 
+           "failed": [c for c in failed if c["table"] == t["table"]]} 
+    with open(path, "a", encoding="utf-8") as f: 
+        f.write(json.dumps(rec) + "\n")
+
+# ---------- running the plan ---------- 
+def statement_limit(opts, deadline): 
+    """ statement_timeout (ms, 0 = none) for the next statement: the per-check 
+    limit clamped to what is left of the run budget; None once it is spent. """ 
+    timeout_ms = opts.get("statement_timeout") or 0 
+    if deadline is not None: 
+        left_ms = (deadline - time.monotonic()) * 1000 
+        if left_ms < 1: 
+            return None 
+        timeout_ms = min(timeout_ms or left_ms, left_ms) 
+    return timeout_ms
+
+def run_scheduled(backend, chk, status, opts, deadline, failed=None): 
+    """ Run one planned check (unless its table is already decided) and fold 
+    the answer into status[table]; checks that decided an N go to `failed`. """ 
+    st = status[chk["table"]] 
+    if st[chk["kind"]] == "N": 
+        return  # already decided; skip the rest of this table's checks 
+    timeout_ms = statement_limit(opts, deadline) 
+    if timeout_ms is None: 
+        st[chk["kind"]] = "?" 
+        return 
+    found = backend.run(chk, timeout_ms) 
+    if found is None: 
+        st[chk["kind"]] = "?" 
+    elif (chk["kind"] == "ri") != found: 
+        st[chk["kind"]] = "N"  # FK mismatch, or an FD X -> Y was found 
+        if failed is not None: 
+            failed.append(chk) 
+
+def run_checks(backend, tables, opts=None, failed=None): 
+    """ Check every table; returns [(table, ri, norm)] with "Y", "N" or "?" 
+    ("?" = a deciding check timed out or the run budget ran out). 
+    opts: statement_timeout (ms per statement), budget (seconds for the run), 
+    partition_classes (query FDs once per partition-equivalence class), 
+    shards / shard_min_rows (split big tables across worker connections of 
+    `target`, None = db_config.py; PgBackend only), encode (run the FD phase 
+    on a dictionary-encoded temp copy; PgBackend only), progress (file each 
+    finished table is recorded in), resume (skip the tables it already holds). """ 
+    opts = opts or {} 
+    failed = [] if failed is None else failed 
+    deadline = time.monotonic() + opts["budget"] if opts.get("budget") else None 
+    backend.deadline = deadline 
+    progress = opts.get("progress") 
+    done = load_progress(progress, tables) if opts.get("resume") else {} 
+    if progress: 
+        # start the file over with the records still valid (drops a torn last line) 
+        with open(progress, "w", encoding="utf-8") as f: 
+            for rec in done.values(): 
+                f.write(json.dumps(rec) + "\n") 
+    exists = {} 
+    status = {} 
+    for rec in done.values(): 
+        status[rec["table"]] = {"ri": rec["ri"], "fd": rec["fd"]} 
+        failed.extend(rec["failed"]) 
+    todo = [t for t in tables if t["table"] not in done] 
+    for t in todo: 
+        ok, reason = backend.validate(t) 
+        exists[t["table"]] = ok 
+        # RI unknown -> N; still attempt normalization best-effort 
+        status[t["table"]] = {"ri": "Y" if ok else "N", "fd": "Y"} 
+
+    try: 
+        plan = plan_checks(backend, todo, exists, opts, deadline) if todo else [] 
+        left = Counter(chk["table"] for chk in plan) 
+        if progress: 
+            for t in todo: 
+                if not left[t["table"]]: 
+                    save_progress(progress, t, status[t["table"]], failed) 
+        by_name = {t["table"]: t for t in todo} 
+        for chk in plan: 
+            run_scheduled(backend, chk, status, opts, deadline, failed) 
+            left[chk["table"]] -= 1 
+            if progress and not left[chk["table"]]: 
+                save_progress(progress, by_name[chk["table"]], status[chk["table"]], failed) 
+    finally: 
+        backend.finish() 
+    return [(t["table"], status[t["table"]]["ri"], status[t["table"]]["fd"]) for t in tables]
+
+# ---------- violation export ---------- 
+def copy_to_gzip(cur, sql, path, header): 
+    """ Stream COPY (sql) TO STDOUT into a gzip'd CSV; memory stays flat. """ 
+    copy = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)" 
+    log_sql(header, copy) 
+    try: 
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as f: 
+            cur.copy_expert(copy, f) 
+    except (OSError, psycopg2.Error): 
+        if os.path.isfile(path): 
+            os.remove(path)  # no half-written or empty file for a failed COPY 
+        raise
+
+def export_violations(cur, tables, failed, out_dir): 
+    """ Orphan child rows for every FK of a table that failed RI, and the 
+    determinant groups of every FD that made a table fail normalization. A 
+    file that cannot be written is reported and skipped. """ 
+    try: 
+        os.makedirs(out_dir, exist_ok=True) 
+    except OSError as e: 
+        print(f"export failed: {e}") 
+        return [] 
+    by_name = {t["table"]: t for t in tables} 
+    jobs = [] 
+    for chk in failed: 
+        name = chk["table"] 
+        if chk["kind"] == "ri": 
+            for fk in by_name[name]["fks"]: 
+                jobs.append((os.path.join(out_dir, f"{name}.orphans.{'-'.join(fk['cols'])}.csv.gz"), 
+                             q_orphan_rows(name, fk["cols"], fk["ref_table"], fk["ref_cols"]), 
+                             f"export orphans {fk_label(name, fk)}")) 
+        else: 
+            jobs.append((os.path.join(out_dir, f"{name}.fd.{chk['x']}-{chk['y']}.csv.gz"), 
+                         q_fd_groups(name, chk["x"], chk["y"]), 
+                         f"export FD groups {name}: {chk['x']} -> {chk['y']}")) 
+    written = [] 
+    for path, sql, header in jobs: 
+        try: 
+            copy_to_gzip(cur, sql, path, header) 
+        except (OSError, psycopg2.Error) as e: 
+            if isinstance(e, psycopg2.Error) and not cur.connection.closed: 
+                cur.connection.rollback() 
+            if getattr(e, "pgcode", None) not in MISSING_OBJECT:  # a missing parent is why RI failed 
+                print(f"could not write {path}: {(str(e).strip().splitlines() or [type(e).__name__])[0]}") 
+            continue 
+        written.append(path) 
+    return written
+
+def format_report(rows): 
+    db_ri, db_norm = db_summary(rows) 
+    out = "referential integrity normalized\n" 
+    for tname, ri, norm in rows: 
+        out += f"{tname}\t\t{ri}\t\t{norm}\n" 
+    out += f"\nDB referential integrity: {db_ri}\n" 
+    out += f"DB normalized: {db_norm}\n" 
+    return out
+
+def db_summary(rows): 
+    # N beats ?, ? beats Y 
+    def combine(vals): 
+        return "N" if "N" in vals else ("?" if "?" in vals else "Y") 
+    return combine([r[1] for r in rows]), combine([r[2] for r in rows])
+
+# ---------- fan-out across many targets ---------- 
+def check_target(target, tables, timeout=None, opts=None): 
+    """ Run every check for one target; `timeout` seconds is the target's run 
+    budget, so checks that do not fit come back as "?" instead of hanging. """ 
+    res = {"name": target["name"], "rows": None, "error": None} 
+    opts = dict(opts or {}, target=target) 
+    if timeout: 
+        opts["budget"] = min(timeout, opts.get("budget") or timeout) 
+    backend = None 
+    try: 
+        backend = PgBackend(acquire(target, timeout).cursor(), opts) 
+        res["rows"] = run_checks(backend, tables, opts) 
+    except Exception as e: 
+        res["error"] = (str(e).strip().splitlines() or [type(e).__name__])[0] 
+    finally: 
+        if backend is not None: 
+            release(backend.cur.connection) 
+    return res
+
+def fan_out(targets, tables, workers=4, timeout=None, opts=None): 
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool: 
+        return list(pool.map(lambda tg: check_target(tg, tables, timeout, opts), targets))
+
+def write_matrix(out_path, tables, results): 
+    """ One row per table, one column per target; cells are "RI/normalized". """ 
+    names = sorted({t["table"] for t in tables}, key=str.lower) 
+    cells = [] 
+    for res in results: 
+        if res["error"]: 
+            cells.append(({n: "ERR" for n in names}, "ERR")) 
+            continue 
+        by_table = {r[0]: f"{r[1]}/{r[2]}" for r in res["rows"]} 
+        cells.append((by_table, "/".join(db_summary(res["rows"])))) 
+    with open(out_path, "w", encoding="utf-8") as f: 
+        f.write("referential integrity/normalized per target\n") 
+        f.write("table\t\t" + "\t".join(f"[{i}]" for i in range(1, len(results) + 1)) + "\n") 
+        for n in names: 
+            f.write(f"{n}\t\t" + "\t".join(c[0].get(n, "-") for c in cells) + "\n") 
+        f.write("\nDB\t\t" + "\t".join(c[1] for c in cells) + "\n\n") 
+        for i, res in enumerate(results, 1): 
+            f.write(f"[{i}] {res['name']}" + (f"  ({res['error']})" if res["error"] else "") + "\n")
+
+# ---------- monitoring (see monitor.py) ---------- 
+def run_monitor_command(args): 
+    import monitor 
+    try: 
+        conn = connect() 
+    except Exception as e: 
+        print(f"DB connection failed: {e}") 
+        sys.exit(1) 
+    cur = conn.cursor() 
+    try: 
+        if args.uninstall_monitor: 
+            monitor.uninstall(cur) 
+            print("monitoring removed") 
+            return 
+        cur.execute("SELECT to_regclass(%s)", (f"{monitor.SCHEMA}.tables",)) 
+        if cur.fetchone()[0] is None: 
+            print("Error: monitoring is not installed; run with --install-monitor first") 
+            sys.exit(1) 
+        while True: 
+            print(time.strftime("-- %Y-%m-%d %H:%M:%S")) 
+            print(format_report(monitor.read_status(cur))) 
+            if not args.watch: 
+                break 
+            time.sleep(args.watch) 
+    except KeyboardInterrupt: 
+        pass 
+    finally: 
+        conn.close()
+
+# ---------- discovery (see discover.py) ---------- 
+def run_discover(args, tables): 
+    """ Annotate `tables` (or every table found) with discovered keys and FKs 
+    and write them in the schema-file format to args.discover. """ 
+    import discover 
+    conn = None 
+    if args.data_dir: 
+        from filebackend import FileBackend 
+        backend = FileBackend(args.data_dir) 
+    else: 
+        try: 
+            conn = connect() 
+        except Exception as e: 
+            print(f"DB connection failed: {e}") 
+            sys.exit(1) 
+        backend = PgBackend(conn.cursor()) 
+    if tables is None: 
+        tables = [{"table": n, "columns": [], "pk": [], "fks": []} for n in backend.list_tables()] 
+    found = discover.discover(backend, tables) 
+    if conn is not None: 
+        conn.close() 
+    with open(args.discover, "w", encoding="utf-8") as f: 
+        for t in found: 
+            f.write(discover.format_schema_line(t) + "\n") 
+    print(open(args.discover, "r", encoding="utf-8").read())
+
 # ---------- main ---------- 
 def main(): 
     ap = argparse.ArgumentParser() 
     ap.add_argument("database", nargs="?", help="(compat) use database=<file>.txt style") 
     ap.add_argument("--database", dest="database_kw", help="path to input schema file") 
+    ap.add_argument("--targets", help="file of connection targets (db_config.py style blocks or one DSN per line)") 
+    ap.add_argument("--workers", type=int, default=4, help="max targets checked concurrently") 
+    ap.add_argument("--target-timeout", type=float, default=None, help="seconds allowed per target") 
+    ap.add_argument("--statement-timeout", type=int, default=None, help="ms allowed per check query (unfinished -> ?)") 
+    ap.add_argument("--budget", type=float, default=None, help="seconds allowed for the whole run (unfinished -> ?)") 
+    ap.add_argument("--partition-classes", action="store_true", help="fingerprint column partitions first and check FDs once per class") 
+    ap.add_argument("--shards", type=int, default=1, help="worker connections per large table (one exported snapshot)") 
+    ap.add_argument("--shard-min-rows", type=int, default=1000000, help="estimated rows before a table is sharded") 
+    ap.add_argument("--encode", action="store_true", help="run FD checks on a narrow integer-coded temp copy of each table") 
+    ap.add_argument("--data-dir", help="check <table>.csv / <table>.parquet dumps in DIR instead of the database") 
+    ap.add_argument("--install-monitor", action="store_true", help="install triggers keeping RI/FD counters for the schema file's tables") 
+    ap.add_argument("--uninstall-monitor", action="store_true", help="drop the monitoring triggers and side tables") 
+    ap.add_argument("--watch", nargs="?", type=float, const=0, metavar="SECONDS", help="print the monitored status (repeat every SECONDS)") 
+    ap.add_argument("--discover", metavar="OUT", help="find candidate keys and FKs and write them as a schema file to OUT") 
+    ap.add_argument("--export-violations", metavar="DIR", help="write orphan rows and FD groups as .csv.gz files to DIR") 
+    ap.add_argument("--resume", action="store_true", help="skip tables an interrupted earlier run already finished (refintnorm-<file>.progress)") 
     args, unknown = ap.parse_known_args() 
     
+    if args.watch is not None or args.uninstall_monitor: 
+        run_monitor_command(args) 
+        return
+
     # Support "database=foo.txt" style like the spec:contentReference[oaicite:9]{index=9} 
     schema_path = None 
     if args.database_kw: 
@@ -220,6 +1192,10 @@ def main():
     else: 
         # also accept a plain positional path 
         schema_path = args.database
+    if args.discover and not schema_path: 
+        # no schema file: discover over every table in the database / data dir 
+        run_discover(args, None) 
+        return 
     if not schema_path or not os.path.exists(schema_path): 
         print("Error: provide input schema file as python3 checkdb.py database=<file>.txt") 
         sys.exit(1) 
@@ -233,46 +1209,93 @@ def main():
             print("No valid tables parsed from input file.") 
             sys.exit(1) 
             
+    opts = {"statement_timeout": args.statement_timeout, "budget": args.budget, 
+            "partition_classes": args.partition_classes, 
+            "shards": args.shards, "shard_min_rows": args.shard_min_rows, 
+            "encode": args.encode}
+
+    if args.targets: 
+        if not os.path.exists(args.targets): 
+            print(f"Error: targets file not found: {args.targets}") 
+            sys.exit(1) 
+        targets = load_targets(args.targets) 
+        if not targets: 
+            print("No connection targets parsed from targets file.") 
+            sys.exit(1) 
+        results = fan_out(targets, tables, args.workers, args.target_timeout, opts) 
+        close_pools() 
+        out_path = f"refintnorm-matrix-{os.path.basename(schema_path)}" 
+        write_matrix(out_path, tables, results) 
+        print(open(out_path, "r", encoding="utf-8").read()) 
+        return
+
     out_path = f"refintnorm-{os.path.basename(schema_path)}" 
-    rows_for_output = []
+    opts["progress"] = out_path + ".progress" 
+    opts["resume"] = args.resume 
 
-    try: 
-        conn = connect() 
+    if args.discover: 
+        run_discover(args, tables) 
+        return
+
+    if args.install_monitor: 
+        try: 
+            conn = connect() 
+        except Exception as e: 
+            print(f"DB connection failed: {e}") 
+            sys.exit(1) 
         cur = conn.cursor() 
-    except Exception as e: 
-        print(f"DB connection failed: {e}") 
+        backend = PgBackend(cur, opts) 
+        valid = {t["table"]: backend.validate(t)[0] for t in tables} 
+        pairs = {t["table"]: fd_pairs(backend.columns(t), t) for t in tables} 
+        import monitor 
+        watched = monitor.install(cur, tables, valid, pairs) 
+        print(f"monitoring {len(watched)} tables: {', '.join(watched)}") 
+        conn.close() 
+        return
+
+    if args.export_violations and args.data_dir: 
+        print("Error: --export-violations needs a database connection, not --data-dir") 
         sys.exit(1) 
-        
-    for t in tables: 
-        ok, reason = check_table_exists_and_columns(cur, t) 
-        if not ok: 
-            # RI unknown -> N; still attempt normalization best-effort 
-            ri_ok = False 
-            norm_ok = check_normalization_3nf_bcnf(cur, t) 
-            rows_for_output.append((t["table"], "Y" if ri_ok else "N", "Y" if norm_ok else "N")) 
-            continue 
-        else: 
-            ri_ok = check_referential_integrity(cur, t) 
-            norm_ok = check_normalization_3nf_bcnf(cur, t) 
-            rows_for_output.append((t["table"], "Y" if ri_ok else "N", "Y" if norm_ok else "N")) 
 
-    cur.close() 
-    conn.close()
+    on_db = not args.data_dir 
+    if args.data_dir: 
+        from filebackend import FileBackend 
+        backend = FileBackend(args.data_dir) 
+    else: 
+        try: 
+            backend = PgBackend(acquire().cursor(), opts) 
+        except Exception as e: 
+            print(f"DB connection failed: {e}") 
+            sys.exit(1) 
+        
+    failed = [] 
+    try: 
+        rows_for_output = run_checks(backend, tables, opts, failed) 
+    except Exception as e: 
+        if not on_db or not isinstance(e, psycopg2.Error) or not backend.lost(): 
+            raise  # not a dropped connection: nothing --resume would fix 
+        print(f"DB connection lost: {(str(e).strip().splitlines() or [type(e).__name__])[0]}") 
+        print(f"finished tables are kept in {opts['progress']}; rerun with --resume") 
+        sys.exit(1)
 
     # Sort by table name and compute DB summaries:contentReference[oaicite:12]{index=12} 
     rows_for_output.sort(key=lambda x: x[0].lower()) 
-    db_ri = "Y" if all(r[1] == "Y" for r in rows_for_output) else "N" 
-    db_norm = "Y" if all(r[2] == "Y" for r in rows_for_output) else "N" 
     
     # Write output in your exact format 
     with open(out_path, "w", encoding="utf-8") as f: 
-        f.write("referential integrity normalized\n") 
-        for tname, ri, norm in rows_for_output: 
-            f.write(f"{tname}\t\t{ri}\t\t{norm}\n") 
-        f.write(f"\nDB referential integrity: {db_ri}\n") 
-        f.write(f"DB normalized: {db_norm}\n") 
+        f.write(format_report(rows_for_output)) 
+    os.remove(opts["progress"])  # the run is complete; nothing to resume 
         
     # Mirror to stdout for convenience 
     print(open(out_path, "r", encoding="utf-8").read()) 
+
+    # the report is already written: a failed export cannot lose it 
+    if args.export_violations: 
+        for path in export_violations(backend.cur, tables, failed, args.export_violations): 
+            print(f"wrote {path}") 
+
+    if on_db: 
+        release(backend.cur.connection) 
+        close_pools()
         
 if __name__ == "__main__": main()
@@ -1,279 +1,222 @@
-import argparse, os, re, sys 
-import psycopg2 
-from db_config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD 
-
-# ---------- helpers for SQL logging ---------- 
-SQL_LOG_PATH = "queries.sql" 
-def log_sql(header, sql): 
-    with open(SQL_LOG_PATH, "a", encoding="utf-8") as f: 
-        f.write(f"\n-- {header}\n") 
-        f.write(sql.strip() + ";\n")
-
-# ---------- parse the input schema file ---------- 
-TABLE_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*\((.*)\)\s*$") 
-FK_RE = re.compile(r"\(fk\s*:\s*([A-Za-z_][A-Za-z0-9_]*)\s*\.\s*([A-Za-z_][A-Za-z0-9_]*)\s*\)", re.I) 
-PK_TAG = "(pk)"
-
-def smart_split_cols(inner): # split by commas not inside parentheses 
-    parts, buf, depth = [], [], 0 
-    for ch in inner: 
-        if ch == '(': 
-            depth += 1
-            buf.append(ch)
-        elif ch == ')': 
-            depth -= 1 
-            buf.append(ch) 
-        elif ch == ',' and depth == 0: 
-            parts.append("".join(buf).strip()) 
-            buf = [] 
-        else: 
-            buf.append(ch) 
-    if buf: 
-        parts.append("".join(buf).strip()) 
-    return parts
-
-def parse_schema_line(line): 
-    m = TABLE_RE.match(line) 
-    if not m: return None 
-    tname = m.group(1).strip().lower() # <-- force lower 
-    inner = m.group(2) 
-    
-    columns = smart_split_cols(inner) 
-    pk_col = None 
-    fks = [] 
-    pure_cols = [] 
-    
-    for coldef in columns: 
-        coldef_clean = coldef.strip() 
-        name_part = coldef_clean.split("(")[0].strip().lower() # <-- lower 
-        if name_part: 
-            pure_cols.append(name_part) 
-        # PK tag tolerant 
-        if PK_TAG in coldef_clean.replace(" ", "").lower(): 
-            pk_col = name_part 
-            
-        # FK tag tolerant 
-        fk_m = FK_RE.search(coldef_clean) 
-        if fk_m: 
-            ref_table = fk_m.group(1).strip().lower() # <-- lower 
-            ref_col = fk_m.group(2).strip().lower() # <-- lower 
-            fks.append({"col": name_part, "ref_table": ref_table, "ref_col": ref_col}) 
-            
-    return {"table": tname, "columns": pure_cols, "pk": pk_col, "fks": fks}
-
-def parse_input_file(path): 
-    tables = [] 
-    with open(path, "r", encoding="utf-8") as f: 
-        for raw in f: 
-            raw = raw.strip("\ufeff").strip() 
-            if not raw: 
-                continue 
-            # ignore filenames, separators, and comments 
-            if raw.lower().endswith((".txt", ".sql", ".out")): 
-                continue 
-            if all(ch == "-" for ch in raw) and len(raw) >= 5: 
-                continue 
-            if raw.startswith(("--", "#", "//")): 
-                continue 
-            if "(" not in raw or ")" not in raw: 
-                continue 
-            parsed = parse_schema_line(raw) 
-            if parsed: 
-                tables.append(parsed) 
-    return tables
-
-# ---------- DB connection ---------- 
-def connect(): 
-    return psycopg2.connect(
-        host=DB_HOST, port=DB_PORT, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
-
-# ---------- SQL helpers ---------- 
-def q_count_all(table): 
-    return f"SELECT COUNT(*) FROM {table}" 
-
-def q_count_join_left_on_fk(left, fk_col, right, right_pk): 
-    return ("SELECT COUNT(*) " f"FROM {left} INNER JOIN {right} ON {left}.{fk_col} = {right}.{right_pk}")
-
-def q_exists_rows(table, where_sql): 
-    return f"SELECT EXISTS(SELECT 1 FROM {table} WHERE {where_sql} LIMIT 1)" 
-
-def q_exists_fd_violation(table, x, y):
-    # FD X→Y exists for some repeated X if:
-    # - COUNT(*) > 1  (the determinant value repeats)
-    # - At least one non-NULL Y in that group
-    # - MIN(Y) IS NOT DISTINCT FROM MAX(Y) (NULL-safe "all equal")
-    return (
-        "SELECT EXISTS ("
-        f"  SELECT 1 FROM {table} "
-        f"  GROUP BY {x} "
-        f"  HAVING COUNT(*) > 1 "
-        f"     AND COUNT({y}) FILTER (WHERE {y} IS NOT NULL) > 0 "
-        f"     AND MIN({y}) IS NOT DISTINCT FROM MAX({y})"
-        ")"
-    )
-
-
-def q_table_has_column(table, col): 
-    return (
-        "SELECT EXISTS (" 
-        " SELECT 1 FROM information_schema.columns " 
-        f" WHERE table_name = '{table.lower()}' AND column_name = '{col.lower()}'" 
-        ")" 
-        )
-
-def get_actual_columns(cur, table): 
-    """ Return the actual column names from the DB for table, in order. """ 
+import argparse, glob, json, os, re, sys, threading, time
+import psycopg2
+import psycopg2.extensions
+import hw1Zain10 as engine
+
+# Test harness for hw1Zain10.py. For every tc<N>.txt / tc<N>.sql pair it loads
+# the .sql into a local PostgreSQL stand-in, runs the checks, appends the
+# report to output.txt and records three costs per case:
+#   round_trips   statements the engine sent (every connection it opened)
+#   rows_scanned  seq_tup_read + idx_tup_fetch delta over the case's tables
+#   wall_ms       connect .. close of the checking session
+# The costs are compared with perf_baseline.json; a case over its budget
+# (baseline * (1 + tolerance), wall time also gets an absolute slack) fails
+# the run, and so does a case the baseline has no numbers for.
+# --update-baseline rewrites the measured numbers instead.
+
+BASELINE_PATH = "perf_baseline.json"
+METRICS = ("round_trips", "rows_scanned", "wall_ms")
+DEFAULT_DSN = "dbname=postgres host=localhost"
+STATS_WAIT = 2.0  # seconds to wait for the closed session's table stats to show up
+CASE_RE = re.compile(r"^tc(\d+)\.txt$")
+
+# ---------- counting round trips ----------
+_trips_lock = threading.Lock()  # sharded checks count from worker threads
+round_trips = {"n": 0}
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, sql, args=None):
+        with _trips_lock:
+            round_trips["n"] += 1
+        return super().execute(sql, args)
+
+    def executemany(self, sql, arg_list):
+        with _trips_lock:
+            round_trips["n"] += 1
+        return super().executemany(sql, arg_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        with _trips_lock:
+            round_trips["n"] += 1
+        return super().copy_expert(sql, file, size)
+
+def counting_target(target):
+    """ Same target, but every connection the engine opens (shard workers
+    included) hands out CountingCursors. """
+    return dict(target, conn=dict(target["conn"], cursor_factory=CountingCursor))
+
+# ---------- cases ----------
+def find_cases(directory):
+    cases = []
+    for path in glob.glob(os.path.join(directory, "tc*.txt")):
+        m = CASE_RE.match(os.path.basename(path))
+        if m and os.path.exists(path[:-4] + ".sql"):
+            cases.append((int(m.group(1)), f"tc{m.group(1)}", path))
+    return [(name, path) for _, name, path in sorted(cases)]
+
+def load_case(target, schema_path, tables):
+    """ Run tc<N>.sql on its own connection, then ANALYZE the case's tables so
+    the scheduler's order (and with it the query count) does not depend on
+    when autovacuum gets around to them. """
+    with open(schema_path[:-4] + ".sql", "r", encoding="utf-8") as f:
+        sql = f.read()
+    conn = engine.connect(target)
+    try:
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute(sql)
+        for t in tables:
+            cur.execute("SELECT to_regclass(%s)", (t["table"],))
+            if cur.fetchone()[0] is not None:
+                cur.execute(f"ANALYZE {t['table']}")
+    finally:
+        conn.close()
+
+def rows_scanned(cur, tables):
+    cur.execute("SELECT pg_stat_clear_snapshot()")
     cur.execute(
-        "SELECT column_name FROM information_schema.columns " 
-        "WHERE table_name = %s ORDER BY ordinal_position", 
-        (table.lower(),) ) 
-    return [r[0] for r in cur.fetchall()]
-
-# ---------- checks ---------- 
-def safe_fetch_bool(cur, sql, header): 
-    log_sql(header, sql) 
-    cur.execute(sql) 
-    v = cur.fetchone()[0] 
-    return bool(v) 
-
-def safe_fetch_int(cur, sql, header): 
-    log_sql(header, sql) 
-    cur.execute(sql) 
-    return int(cur.fetchone()[0]) 
-
-def check_table_exists_and_columns(cur, t): 
-    # table must exist 
-    cur.execute("SELECT to_regclass(%s)", (t["table"],)) 
-    if cur.fetchone()[0] is None: 
-        return False, "table-missing" 
-    
-    # PK must be present in input and exist as a column 
-    pk = t.get("pk") 
-    if not pk: 
-        return False, "pk-missing"
-    if not safe_fetch_bool(cur, q_table_has_column(t["table"], pk), f"check pkcol {t['table']}.{pk}"): 
-        return False, "pkcol-missing" 
-    
-    # If FKs exist: the FK column on THIS table must exist. 
-    # (Do NOT hard-fail on referenced table/col; the RI check will reflect it.) 
-    for fk in t["fks"]: 
-        if not safe_fetch_bool(cur, q_table_has_column(t["table"], fk["col"]), f"check fkcol {t['table']}.{fk['col']}"): 
-            return False, f"fkcol-missing:{fk['col']}" 
-    return True, "ok"
-
-def check_referential_integrity(cur, t): 
-    # Tables without FK are trivially Y:contentReference[oaicite:7]{index=7} 
-    if not t["fks"]: 
-        return True 
-    # For each FK, compare |T| with |T ⋈ FK T_ref| 
-    n_all = safe_fetch_int(cur, q_count_all(t["table"]), f"count {t['table']}") 
-    for fk in t["fks"]: 
-        join_n = safe_fetch_int( 
-            cur, 
-            q_count_join_left_on_fk(t["table"], fk["col"], fk["ref_table"], fk["ref_col"]), 
-            f"count join {t['table']}..{fk['col']} -> {fk['ref_table']}..{fk['ref_col']}" ) 
-        if join_n != n_all: 
-            return False 
-    return True
-
-def check_normalization_3nf_bcnf(cur, t):
-    cols = [c.lower() for c in get_actual_columns(cur, t["table"])]
-    if not cols:
-        return True
-
-    pk = (t.get("pk") or "").lower()
-    if pk not in cols:
-        pk = cols[0]
-
-    non_pk_cols = [c for c in cols if c != pk]
-
-    # NEW: build a set of FK columns for this table
-    fk_cols = { fk["col"].lower() for fk in t.get("fks", []) }
-
-    # Only check FDs where:
-    # - X is a non-PK column AND not an FK column
-    # - Y is a non-PK column (as before; ignore X→PK)
-    for x in non_pk_cols:
-        if x in fk_cols:
-            continue  # skip FK determinants
-        for y in non_pk_cols:
-            if y == x:
-                continue
-            sql = q_exists_fd_violation(t["table"], x, y)
-            if safe_fetch_bool(cur, sql, f"FD check {t['table']}: {x} -> {y}"):
-                return False
-    return True
-        
-# ---------- main ---------- 
-def main(): 
-    ap = argparse.ArgumentParser() 
-    ap.add_argument("database", nargs="?", help="(compat) use database=<file>.txt style") 
-    ap.add_argument("--database", dest="database_kw", help="path to input schema file") 
-    args, unknown = ap.parse_known_args() 
-    
-    # Support "database=foo.txt" style like the spec:contentReference[oaicite:9]{index=9} 
-    schema_path = None 
-    if args.database_kw: 
-        schema_path = args.database_kw 
-    elif args.database and args.database.startswith("database="): 
-        schema_path = args.database.split("=", 1)[1] 
-    else: 
-        # also accept a plain positional path 
-        schema_path = args.database
-    if not schema_path or not os.path.exists(schema_path): 
-        print("Error: provide input schema file as python3 checkdb.py database=<file>.txt") 
-        sys.exit(1) 
-        
-    # Reset SQL log; include comment with input file name:contentReference[oaicite:10]{index=10} 
-    with open(SQL_LOG_PATH, "w", encoding="utf-8") as f: 
-        f.write(f"-- checkdb.sql generated for input: {os.path.basename(schema_path)}\n") 
-            
-        tables = parse_input_file(schema_path) 
-        if not tables: 
-            print("No valid tables parsed from input file.") 
-            sys.exit(1) 
-            
-    out_path = "output.txt" 
-    rows_for_output = []
-
-    try: 
-        conn = connect() 
-        cur = conn.cursor() 
-    except Exception as e: 
-        print(f"DB connection failed: {e}") 
-        sys.exit(1) 
-        
-    for t in tables: 
-        ok, reason = check_table_exists_and_columns(cur, t) 
-        if not ok: 
-            # RI unknown -> N; still attempt normalization best-effort 
-            ri_ok = False 
-            norm_ok = check_normalization_3nf_bcnf(cur, t) 
-            rows_for_output.append((t["table"], "Y" if ri_ok else "N", "Y" if norm_ok else "N")) 
-            continue 
-        else: 
-            ri_ok = check_referential_integrity(cur, t) 
-            norm_ok = check_normalization_3nf_bcnf(cur, t) 
-            rows_for_output.append((t["table"], "Y" if ri_ok else "N", "Y" if norm_ok else "N")) 
+        "SELECT coalesce(sum(seq_tup_read + coalesce(idx_tup_fetch, 0)), 0) "
+        "FROM pg_stat_user_tables "
+        "WHERE relname = ANY (%s) AND schemaname = ANY (current_schemas(false))",
+        ([t["table"].lower() for t in tables],) )
+    return int(cur.fetchone()[0])
+
+def settled_rows_scanned(cur, tables, before):
+    # a backend reports its table stats when it exits (or, before PG 15, via
+    # the stats collector a little later), so poll until the delta shows up
+    stop = time.monotonic() + STATS_WAIT
+    while True:
+        n = rows_scanned(cur, tables)
+        if n != before or time.monotonic() >= stop:
+            return n - before
+        time.sleep(0.1)
+
+def run_case(target, name, schema_path, opts):
+    """ Load, check and measure one case; returns (report rows, metrics). """
+    tables = engine.parse_input_file(schema_path)
+    if not tables:
+        raise RuntimeError("no valid tables parsed from input file")
+    load_case(target, schema_path, tables)
+
+    stats_conn = engine.connect(target)
+    stats_conn.autocommit = True
+    stats_cur = stats_conn.cursor()
+    try:
+        before = rows_scanned(stats_cur, tables)
+        with open(engine.SQL_LOG_PATH, "w", encoding="utf-8") as f:
+            f.write(f"-- checkdb.sql generated for input: {os.path.basename(schema_path)}\n")
+
+        counted = counting_target(target)
+        opts = dict(opts, target=counted)
+        round_trips["n"] = 0
+        start = time.perf_counter()
+        # a plain connection, not a pooled one: every case starts from a cold
+        # session, so statements PREPAREd by an earlier case are not reused
+        backend = engine.PgBackend(engine.connect(counted).cursor(), opts)
+        try:
+            rows = engine.run_checks(backend, tables, opts)
+        finally:
+            engine.release(backend.cur.connection)
+        wall_ms = (time.perf_counter() - start) * 1000
+        trips = round_trips["n"]
+
+        scanned = settled_rows_scanned(stats_cur, tables, before)
+    finally:
+        stats_conn.close()
+    rows.sort(key=lambda x: x[0].lower())
+    return rows, {"round_trips": trips, "rows_scanned": scanned, "wall_ms": round(wall_ms, 1)}
+
+# ---------- baseline ----------
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {"tolerance": {}, "wall_slack_ms": 0, "cases": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def budget(baseline, name, metric):
+    """ Allowed value of metric for case name, None when there is no baseline. """
+    base = baseline.get("cases", {}).get(name, {}).get(metric)
+    if base is None:
+        return None
+    allowed = base * (1 + baseline.get("tolerance", {}).get(metric, 0))
+    if metric == "wall_ms":
+        allowed += baseline.get("wall_slack_ms", 0)  # short cases are mostly noise
+    return allowed
+
+def over_budget(baseline, name, metrics):
+    """ [(metric, measured, allowed)] for every metric above its budget. """
+    out = []
+    for m in METRICS:
+        allowed = budget(baseline, name, m)
+        if allowed is not None and metrics[m] > allowed:
+            out.append((m, metrics[m], allowed))
+    return out
+
+# ---------- main ----------
+def main():
+    ap = argparse.ArgumentParser(description="run tc*.txt / tc*.sql cases and check their query, scan and time budgets")
+    ap.add_argument("dir", nargs="?", default=".", help="directory holding the test cases (default: .)")
+    ap.add_argument("--dsn", default=os.environ.get("CHECKDB_TEST_DSN", DEFAULT_DSN),
+                    help="libpq DSN of the local PostgreSQL stand-in (default: $CHECKDB_TEST_DSN or %(default)s)")
+    ap.add_argument("--baseline", default=BASELINE_PATH, help="baseline file (default: %(default)s)")
+    ap.add_argument("--update-baseline", action="store_true", help="record the measured costs as the new baseline")
+    ap.add_argument("--case", action="append", help="run only this case (e.g. tc1); repeatable")
+    ap.add_argument("--output", default="output.txt", help="file the reports are appended to")
+    args = ap.parse_args()
+
+    cases = find_cases(args.dir)
+    if args.case:
+        cases = [c for c in cases if c[0] in args.case]
+    if not cases:
+        print(f"Error: no tc<N>.txt / tc<N>.sql pairs in {args.dir}")
+        sys.exit(1)
+
+    engine.SQL_LOG_PATH = "queries.sql"
+    target = engine.make_target({"dsn": args.dsn})
+    baseline = load_baseline(args.baseline)
+    opts = {"statement_timeout": None, "budget": None}
+    measured, failures = {}, 0
+
+    for name, path in cases:
+        try:
+            rows, metrics = run_case(target, name, path, opts)
+        except Exception as e:
+            print(f"{name}: ERROR {(str(e).strip().splitlines() or [type(e).__name__])[0]}")
+            failures += 1
+            continue
+        measured[name] = metrics
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(f"{os.path.basename(path)}\n" + "-" * 41 + "\n")
+            f.write(engine.format_report(rows) + "\n")
+
+        line = " ".join(f"{m}={metrics[m]}" for m in METRICS)
+        if args.update_baseline:
+            print(f"{name}: {line}")
+            continue
+        recorded = baseline.get("cases", {}).get(name, {})
+        missing = [m for m in METRICS if m not in recorded]
+        if missing:
+            # an unrecorded case must not pass by default
+            failures += 1
+            print(f"{name}: FAIL {line}")
+            print(f"    no baseline for {', '.join(missing)}; record it with --update-baseline")
+            continue
+        over = over_budget(baseline, name, metrics)
+        if over:
+            failures += 1
+            print(f"{name}: FAIL {line}")
+            for m, got, allowed in over:
+                print(f"    {m} {got} > budget {allowed:g}")
+        else:
+            print(f"{name}: ok {line}")
+
+    if args.update_baseline:
+        baseline.setdefault("cases", {}).update(measured)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"wrote {args.baseline}")
+    engine.close_pools()
+    sys.exit(1 if failures else 0)
 
-    cur.close() 
-    conn.close()
-    
-    # Sort by table name and compute DB summaries:contentReference[oaicite:12]{index=12} 
-    rows_for_output.sort(key=lambda x: x[0].lower()) 
-    db_ri = "Y" if all(r[1] == "Y" for r in rows_for_output) else "N" 
-    db_norm = "Y" if all(r[2] == "Y" for r in rows_for_output) else "N" 
-    
-    # Write output in your exact format 
-    with open(out_path, "a", encoding="utf-8") as f: 
-        f.write("\n" + "-"*50 + "\n")
-        f.write("referential integrity normalized\n") 
-        for tname, ri, norm in rows_for_output: 
-            f.write(f"{tname}\t\t{ri}\t\t{norm}\n") 
-        f.write(f"\nDB referential integrity: {db_ri}\n") 
-        f.write(f"DB normalized: {db_norm}\n") 
-        
-    # Mirror to stdout for convenience 
-    print(open(out_path, "r", encoding="utf-8").read()) 
-        
 if __name__ == "__main__": main()
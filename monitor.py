@@ -0,0 +1,266 @@
+# Continuous monitoring: triggers keep per-FK row and join counts and per-FD group
+# counters in the checkdb_monitor schema up to date on every INSERT/UPDATE/DELETE,
+# so the current RI / normalization status is one small query (--watch) instead
+# of a re-scan. Installed with --install-monitor for the tables of a schema file.
+#
+# Values are keyed as jsonb (to_jsonb(row) -> col), so one generic trigger
+# function serves every table; a NULL column becomes the jsonb 'null'. FK keys
+# are jsonb arrays of the key columns, which folds composite keys into one value.
+# TRUNCATE is not tracked: re-run --install-monitor after truncating a table.
+
+SCHEMA = "checkdb_monitor"
+
+DDL = f"""
+CREATE SCHEMA IF NOT EXISTS {SCHEMA};
+
+-- every table carrying the trigger; reported = listed in the schema file
+CREATE TABLE IF NOT EXISTS {SCHEMA}.tables (
+    tbl text PRIMARY KEY, reported boolean NOT NULL, valid boolean NOT NULL);
+
+-- one row per FK; RI holds when n_rows = n_joined, the checker's |T| = |T join T_ref|:
+-- n_rows = child rows (NULL keys included), n_joined = sum of n_child * n_parent
+CREATE TABLE IF NOT EXISTS {SCHEMA}.fks (
+    fk_id serial PRIMARY KEY, child text NOT NULL, child_cols text[] NOT NULL,
+    parent text NOT NULL, parent_cols text[] NOT NULL,
+    n_rows bigint NOT NULL DEFAULT 0, n_joined bigint NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.fk_keys (
+    fk_id int NOT NULL, key jsonb NOT NULL,
+    n_child bigint NOT NULL DEFAULT 0, n_parent bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (fk_id, key));
+
+-- one row per candidate FD X -> Y; positive_groups = repeated X groups whose
+-- non-NULL Y values are all equal (what q_exists_fd_violation looks for)
+CREATE TABLE IF NOT EXISTS {SCHEMA}.fds (
+    fd_id serial PRIMARY KEY, tbl text NOT NULL, x text NOT NULL, y text NOT NULL,
+    positive_groups bigint NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS {SCHEMA}.fd_groups (
+    fd_id int NOT NULL, xv jsonb NOT NULL,
+    n_rows bigint NOT NULL DEFAULT 0, n_y bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (fd_id, xv));
+CREATE TABLE IF NOT EXISTS {SCHEMA}.fd_values (
+    fd_id int NOT NULL, xv jsonb NOT NULL, yv jsonb NOT NULL, n bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (fd_id, xv, yv));
+
+-- [v1, v2, ...] for the key columns of row r, 'null' if any of them is NULL
+CREATE OR REPLACE FUNCTION {SCHEMA}.row_key(r jsonb, cols text[])
+RETURNS jsonb LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN bool_or(r -> c = 'null'::jsonb OR r -> c IS NULL) THEN 'null'::jsonb
+                ELSE jsonb_agg(r -> c ORDER BY i) END
+    FROM unnest(cols) WITH ORDINALITY AS u(c, i)
+$$;
+
+CREATE OR REPLACE FUNCTION {SCHEMA}.fk_apply(p_fk int, p_key jsonb, p_child int, p_parent int)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    c bigint;
+    p bigint;
+    d bigint;
+BEGIN
+    IF p_key = 'null'::jsonb THEN
+        -- a NULL FK never joins; a NULL parent key matches nothing
+        IF p_child <> 0 THEN
+            UPDATE {SCHEMA}.fks SET n_rows = n_rows + p_child WHERE fk_id = p_fk;
+        END IF;
+        RETURN;
+    END IF;
+    INSERT INTO {SCHEMA}.fk_keys AS k (fk_id, key, n_child, n_parent)
+    VALUES (p_fk, p_key, p_child, p_parent)
+    ON CONFLICT (fk_id, key) DO UPDATE
+        SET n_child = k.n_child + p_child, n_parent = k.n_parent + p_parent
+    RETURNING k.n_child, k.n_parent INTO c, p;
+    -- this key joins n_child * n_parent rows; the shared fks row is only
+    -- touched (and locked) when one of its counts really moves
+    d := c * p - (c - p_child) * (p - p_parent);
+    IF p_child <> 0 OR d <> 0 THEN
+        UPDATE {SCHEMA}.fks SET n_rows = n_rows + p_child, n_joined = n_joined + d
+        WHERE fk_id = p_fk;
+    END IF;
+    IF c = 0 AND p = 0 THEN
+        DELETE FROM {SCHEMA}.fk_keys WHERE fk_id = p_fk AND key = p_key;
+    END IF;
+END $$;
+
+CREATE OR REPLACE FUNCTION {SCHEMA}.fd_apply(p_fd int, p_x jsonb, p_y jsonb, p_delta int)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    vn bigint;
+    dn int := 0;
+    g_rows bigint;
+    g_y bigint;
+    was_pos boolean;
+    is_pos boolean;
+BEGIN
+    IF p_y <> 'null'::jsonb THEN
+        INSERT INTO {SCHEMA}.fd_values AS v (fd_id, xv, yv, n) VALUES (p_fd, p_x, p_y, p_delta)
+        ON CONFLICT (fd_id, xv, yv) DO UPDATE SET n = v.n + p_delta
+        RETURNING v.n INTO vn;
+        IF p_delta > 0 AND vn = p_delta THEN
+            dn := 1;   -- first row with this Y in the group
+        ELSIF p_delta < 0 AND vn = 0 THEN
+            dn := -1;  -- last row with this Y left the group
+            DELETE FROM {SCHEMA}.fd_values WHERE fd_id = p_fd AND xv = p_x AND yv = p_y;
+        END IF;
+    END IF;
+    INSERT INTO {SCHEMA}.fd_groups AS g (fd_id, xv, n_rows, n_y) VALUES (p_fd, p_x, p_delta, dn)
+    ON CONFLICT (fd_id, xv) DO UPDATE SET n_rows = g.n_rows + p_delta, n_y = g.n_y + dn
+    RETURNING g.n_rows, g.n_y INTO g_rows, g_y;
+    was_pos := g_rows - p_delta > 1 AND g_y - dn = 1;
+    is_pos := g_rows > 1 AND g_y = 1;
+    IF was_pos <> is_pos THEN
+        UPDATE {SCHEMA}.fds
+        SET positive_groups = positive_groups + (CASE WHEN is_pos THEN 1 ELSE -1 END)
+        WHERE fd_id = p_fd;
+    END IF;
+    IF g_rows = 0 THEN
+        DELETE FROM {SCHEMA}.fd_groups WHERE fd_id = p_fd AND xv = p_x;
+    END IF;
+END $$;
+
+CREATE OR REPLACE FUNCTION {SCHEMA}.on_change() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    r jsonb;
+    d int;
+    f record;
+BEGIN
+    IF TG_OP = 'UPDATE' AND to_jsonb(OLD) = to_jsonb(NEW) THEN
+        RETURN NULL;
+    END IF;
+    -- an UPDATE is the OLD row leaving and the NEW row arriving
+    FOR i IN 1..2 LOOP
+        IF i = 1 THEN
+            CONTINUE WHEN TG_OP = 'INSERT';
+            r := to_jsonb(OLD);
+            d := -1;
+        ELSE
+            CONTINUE WHEN TG_OP = 'DELETE';
+            r := to_jsonb(NEW);
+            d := 1;
+        END IF;
+        FOR f IN SELECT fk_id, child_cols FROM {SCHEMA}.fks WHERE child = TG_TABLE_NAME LOOP
+            PERFORM {SCHEMA}.fk_apply(f.fk_id, {SCHEMA}.row_key(r, f.child_cols), d, 0);
+        END LOOP;
+        FOR f IN SELECT fk_id, parent_cols FROM {SCHEMA}.fks WHERE parent = TG_TABLE_NAME LOOP
+            PERFORM {SCHEMA}.fk_apply(f.fk_id, {SCHEMA}.row_key(r, f.parent_cols), 0, d);
+        END LOOP;
+        FOR f IN SELECT fd_id, x, y FROM {SCHEMA}.fds WHERE tbl = TG_TABLE_NAME LOOP
+            PERFORM {SCHEMA}.fd_apply(f.fd_id, r -> f.x, r -> f.y, d);
+        END LOOP;
+    END LOOP;
+    RETURN NULL;
+END $$;
+"""
+
+# ---------- seeding from the current data ----------
+def seed_fk(cur, fk_id, child, cols, parent, pcols):
+    # keys built exactly like row_key(): a jsonb array of the key columns
+    key, pkey = (f"jsonb_build_array({', '.join(c)})" for c in (cols, pcols))
+    not_null, pnot_null = (" AND ".join(f"{x} IS NOT NULL" for x in c) for c in (cols, pcols))
+    cur.execute(
+        f"INSERT INTO {SCHEMA}.fk_keys (fk_id, key, n_child, n_parent) "
+        f"SELECT %s, key, sum(nc), sum(np) FROM ("
+        f"  SELECT {key} AS key, count(*) AS nc, 0 AS np FROM {child} "
+        f"  WHERE {not_null} GROUP BY {', '.join(cols)} "
+        f"  UNION ALL "
+        f"  SELECT {pkey}, 0, count(*) FROM {parent} "
+        f"  WHERE {pnot_null} GROUP BY {', '.join(pcols)}"
+        f") s GROUP BY key", (fk_id,))
+    cur.execute(
+        f"UPDATE {SCHEMA}.fks SET n_rows = (SELECT count(*) FROM {child}), "
+        f"  n_joined = (SELECT COALESCE(sum(n_child * n_parent), 0) FROM {SCHEMA}.fk_keys WHERE fk_id = %s) "
+        f"WHERE fk_id = %s", (fk_id, fk_id))
+
+def seed_fd(cur, fd_id, table, x, y):
+    cur.execute(
+        f"INSERT INTO {SCHEMA}.fd_values (fd_id, xv, yv, n) "
+        f"SELECT %s, COALESCE(to_jsonb({x}), 'null'::jsonb), to_jsonb({y}), count(*) FROM {table} "
+        f"WHERE {y} IS NOT NULL GROUP BY {x}, {y}", (fd_id,))
+    cur.execute(
+        f"INSERT INTO {SCHEMA}.fd_groups (fd_id, xv, n_rows, n_y) "
+        f"SELECT %s, COALESCE(to_jsonb({x}), 'null'::jsonb), count(*), count(DISTINCT {y}) "
+        f"FROM {table} GROUP BY {x}", (fd_id,))
+    cur.execute(
+        f"UPDATE {SCHEMA}.fds SET positive_groups = "
+        f"  (SELECT count(*) FROM {SCHEMA}.fd_groups WHERE fd_id = %s AND n_rows > 1 AND n_y = 1) "
+        f"WHERE fd_id = %s", (fd_id, fd_id))
+
+# ---------- install / uninstall ----------
+def drop_triggers(cur):
+    cur.execute("SELECT to_regclass(%s)", (f"{SCHEMA}.tables",))
+    if cur.fetchone()[0] is None:
+        return
+    cur.execute(f"SELECT tbl FROM {SCHEMA}.tables")
+    for (tbl,) in cur.fetchall():
+        cur.execute("SELECT to_regclass(%s)", (tbl,))
+        if cur.fetchone()[0] is not None:
+            cur.execute(f"DROP TRIGGER IF EXISTS checkdb_monitor ON {tbl}")
+
+def install(cur, tables, valid, pairs):
+    """ Replace the monitored set with `tables` (parsed schema file), seed all
+    counters from the current data and attach the triggers, in one transaction.
+    valid: {table: bool} from check_table_exists_and_columns; pairs: {table:
+    [(x, y)]} candidate FDs as in fd_pairs (tables that fail validation keep
+    RI = N but are still watched for FDs, as in run_checks). Run with
+    autocommit off. """
+    drop_triggers(cur)
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")  # also upgrades an older layout
+    cur.execute(DDL)
+
+    # triggers go on every valid table, every table with candidate FDs and every
+    # referenced table that exists
+    watched = {t["table"] for t in tables if valid[t["table"]] or pairs.get(t["table"])}
+    for t in tables:
+        if valid[t["table"]]:
+            for fk in t["fks"]:
+                cur.execute("SELECT to_regclass(%s)", (fk["ref_table"],))
+                if cur.fetchone()[0] is not None:
+                    watched.add(fk["ref_table"])
+    # block writers until the triggers exist so no change slips between seed and trigger
+    for tbl in sorted(watched):
+        cur.execute(f"LOCK TABLE {tbl} IN SHARE ROW EXCLUSIVE MODE")
+
+    names = {t["table"] for t in tables}
+    for tbl in sorted(watched | names):
+        cur.execute(f"INSERT INTO {SCHEMA}.tables (tbl, reported, valid) VALUES (%s, %s, %s)",
+                    (tbl, tbl in names, valid.get(tbl, True)))
+    for t in tables:
+        name = t["table"]
+        for fk in (t["fks"] if valid[name] else []):
+            cur.execute(
+                f"INSERT INTO {SCHEMA}.fks (child, child_cols, parent, parent_cols) "
+                f"VALUES (%s, %s, %s, %s) RETURNING fk_id",
+                (name, fk["cols"], fk["ref_table"], fk["ref_cols"]))
+            fk_id = cur.fetchone()[0]
+            if fk["ref_table"] in watched:
+                seed_fk(cur, fk_id, name, fk["cols"], fk["ref_table"], fk["ref_cols"])
+            else:
+                # referenced table missing: no row joins
+                cur.execute(f"UPDATE {SCHEMA}.fks SET n_rows = (SELECT count(*) FROM {name}) "
+                            f"WHERE fk_id = %s", (fk_id,))
+        for x, y in pairs.get(name, []):
+            cur.execute(f"INSERT INTO {SCHEMA}.fds (tbl, x, y) VALUES (%s, %s, %s) RETURNING fd_id",
+                        (name, x, y))
+            seed_fd(cur, cur.fetchone()[0], name, x, y)
+    for tbl in sorted(watched):
+        cur.execute(f"CREATE TRIGGER checkdb_monitor AFTER INSERT OR UPDATE OR DELETE ON {tbl} "
+                    f"FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.on_change()")
+    cur.connection.commit()
+    return sorted(watched)
+
+def uninstall(cur):
+    drop_triggers(cur)
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.connection.commit()
+
+# ---------- reading the status ----------
+def read_status(cur):
+    """ [(table, ri, norm)] for the tables of the installed schema file; cost
+    depends on the number of monitored FKs/FDs, not on the data. """
+    cur.execute(
+        f"SELECT t.tbl, t.valid, "
+        f"  (SELECT count(*) FROM {SCHEMA}.fks f WHERE f.child = t.tbl AND f.n_rows <> f.n_joined), "
+        f"  COALESCE((SELECT sum(positive_groups) FROM {SCHEMA}.fds d WHERE d.tbl = t.tbl), 0) "
+        f"FROM {SCHEMA}.tables t WHERE t.reported ORDER BY lower(t.tbl)")
+    rows = [(tbl, "Y" if valid and broken == 0 else "N", "Y" if positive == 0 else "N")
+            for tbl, valid, broken, positive in cur.fetchall()]
+    cur.connection.rollback()  # do not sit in an open transaction between polls
+    return rows
@@ -30,6 +30,7 @@ do
 	cp hw2/README hw2_grade/
 	
         cp /mdata/cosc/y2020/fall/cs3380-2/cosc0217/hw2/compareNew.sh hw2_grade/
+        cp /mdata/cosc/y2020/fall/cs3380-2/cosc0217/hw2/compareNew.py hw2_grade/
 	cd hw2_grade
 	##copy ans.out files
 	for((j=1; j<=10; j++))
@@ -53,7 +54,7 @@ do
         
 	
         ./compareNew.sh
-	rm -f compareNew.sh
+	rm -f compareNew.sh compareNew.py
         chmod 744 grade
 
 